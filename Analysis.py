@@ -0,0 +1,92 @@
+import numpy as np
+
+# ----------------------------------------------------------------------------------------------------
+# Time series analysis of the sweep observables: FFT autocorrelation, integrated autocorrelation time
+# with automatic windowing, effective sample size, binning and jackknife error estimates
+# ----------------------------------------------------------------------------------------------------
+# tau_int is taken as 1 + 2 sum_t rho(t), so uncorrelated samples have tau_int = 1
+# and a series of n samples holds n / tau_int independent ones
+
+# the summation window is the smallest W with W >= WINDOW * tau_int(W) (Sokal)
+WINDOW = 5
+
+def autocorrelation(series):
+
+    # normalised autocorrelation rho(t) for t = 0 .. n-1, zero padded so the FFT does not wrap around
+    x = np.asarray(series, dtype = float)
+    n = len(x)
+    x = x - x.mean()
+    size = 1 << (2 * n - 1).bit_length()
+    f = np.fft.rfft(x, size)
+    acf = np.fft.irfft(f * np.conjugate(f), size)[:n]
+    if acf[0] == 0:
+        # constant series, no fluctuations to be correlated
+        rho = np.zeros(n)
+        rho[0] = 1.0
+        return rho
+
+    return acf / acf[0]
+
+def integrated_time(series, window = WINDOW):
+
+    # integrated autocorrelation time in units of the sample spacing
+    rho = autocorrelation(series)
+    if len(rho) < 2:
+        return 1.0
+    taus = 2 * np.cumsum(rho) - 1
+    # automatic windowing: stop summing once the noise in rho(t) would dominate
+    W = np.arange(len(taus))
+    cut = np.argmax(W >= window * taus) if np.any(W >= window * taus) else len(taus) - 1
+
+    return max(float(taus[cut]), 1.0)
+
+def effective_samples(series, window = WINDOW):
+
+    # number of independent samples the series is worth
+    return len(series) / integrated_time(series, window)
+
+# --------------------------
+# Binning & Jackknife Errors
+# --------------------------
+
+def blocks(series, bins):
+
+    # series cut into `bins` equal blocks, any remainder at the start is dropped
+    x = np.asarray(series, dtype = float)
+    size = len(x) // bins
+    return x[len(x) - size * bins:].reshape(bins, size)
+
+def binning_errors(series, min_bins = 32):
+
+    # standard error of the mean with the samples averaged in blocks of 1, 2, 4, ...,
+    # rising while blocks are shorter than tau_int and flattening off once they are longer
+    x = np.asarray(series, dtype = float)
+    errors = []
+    while len(x) >= min_bins:
+        errors.append(np.std(x, ddof = 1) / np.sqrt(len(x)))
+        x = blocks(x, len(x) // 2).mean(axis = 1)
+
+    return np.array(errors)
+
+def binning_error(series, min_bins = 32):
+
+    # error of the mean from the plateau of the binning analysis
+    errors = binning_errors(series, min_bins)
+    if len(errors) == 0:
+        return np.std(series, ddof = 1) / np.sqrt(len(series)) if len(series) > 1 else 0.0
+    return float(errors.max())
+
+def jackknife(estimator, *series, bins = 32):
+
+    # value and error of estimator(*series), e.g. a susceptibility from the |M| series,
+    # re-evaluated with each of `bins` blocks left out in turn
+    n = min(len(s) for s in series)
+    bins = min(bins, n)
+    if bins < 2:
+        return estimator(*series), 0.0
+
+    split = [blocks(s, bins) for s in series]
+    values = np.array([estimator(*[np.delete(b, k, axis = 0).ravel() for b in split]) for k in range(bins)])
+    error = np.sqrt((bins - 1) * np.mean((values - values.mean())**2))
+
+    return estimator(*series), float(error)
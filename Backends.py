@@ -0,0 +1,120 @@
+import numpy as np
+
+import Numpy_Algo as numpy_algo
+
+# numba is optional here, without it only the NumPy backend is registered
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# ----------------------------------------------------------------------------------------------------
+# Sweep backends: each one advances a SimWorker's lattice by one sweep and keeps its running totals up
+# to date, the GUI picks one by name and falls back to the default where a backend does not apply
+# ----------------------------------------------------------------------------------------------------
+
+# name -> (sweep(worker, mag_field, interaction, beta, cluster), supports(model_type, N)), in menu order,
+# the sweep returns its metropolis acceptance rate or None where it has none (cluster and packed sweeps)
+BACKENDS = {}
+
+def register(name, sweep, supports = lambda model_type, N: True):
+    BACKENDS[name] = (sweep, supports)
+
+def select(name, model_type, N):
+
+    # the named backend if it can run this model and size, the default otherwise
+    if name in BACKENDS and BACKENDS[name][1](model_type, N):
+        return name
+    return DEFAULT
+
+if numba is not None:
+    import Metro_Algo as metro
+    import XY_Algo as xy
+    import MSC_Algo as msc
+    import NFold_Algo as nfold
+
+    # -----
+    # Numba
+    # -----
+    def numba_sweep(worker, mag_field, interaction, beta, cluster):
+
+        if worker.model_type == 1:
+            # XY windowed Metropolis and over-relaxation sweep (the cluster switch has no XY mode)
+            if getattr(worker, 'trig', None) is None:
+                worker.trig = xy.ini_trig(worker.config, worker.N)
+            acceptance = xy.sweep(worker.config, worker.trig, mag_field, interaction, beta, worker.N, worker.rng_states, worker.totals, worker.window)
+            worker.window = xy.tune_window(worker.window, acceptance)
+            return acceptance
+        elif cluster and mag_field == 0:
+            # Wolff cluster sweep (zero field only, see Metro_Algo.sweep), which does not keep the
+            # totals, with the mean cluster size of the earlier sweeps at these parameters
+            if getattr(worker, 'cluster_params', None) != (mag_field, interaction, beta):
+                worker.cluster_size = np.zeros(2)
+                worker.cluster_params = (mag_field, interaction, beta)
+            worker.config = metro.sweep(worker.config, mag_field, interaction, beta, worker.N, worker.model_type, True, worker.cluster_size)
+            worker.totals = metro.lattice_totals(worker.config, worker.N, worker.model_type)
+            return None
+        else:
+            # Metropolis sweep, updating each checkerboard colour in parallel (also with the
+            # cluster switch on in a field)
+            return metro.checkerboard_sweep(worker.config, mag_field, interaction, beta, worker.N, worker.model_type, worker.rng_states, worker.totals)
+
+    # --------------------
+    # Multi-Spin Coding
+    # --------------------
+    def msc_sweep(worker, mag_field, interaction, beta, cluster):
+
+        # the packed lattice is only current if the previous sweep was also multi-spin coded
+        if getattr(worker, 'packed_sweeps', None) != worker.sweeps:
+            worker.packed = msc.pack(worker.config[1:worker.N+1,1:worker.N+1], worker.N)
+        msc.sweep(worker.packed, mag_field, interaction, beta, worker.N, 0)
+        worker.packed_sweeps = worker.sweeps + 1
+
+        # the ghost cell lattice and totals are rebuilt for the display and the averages
+        msc.unpack_into(worker.config, worker.packed, worker.N)
+        worker.totals = metro.lattice_totals(worker.config, worker.N, 0)
+        return None
+
+    # -----------
+    # N-Fold Way
+    # -----------
+    def nfold_sweep(worker, mag_field, interaction, beta, cluster):
+
+        # rejection free flips for one sweep of physical time (no cluster moves), the spin
+        # classes are only current if the previous sweep was also an n-fold way one
+        stale = getattr(worker, 'nfold_sweeps', None) != worker.sweeps
+        # above nfold.MAX_RATE flips per site (judged from the last sweep's acceptance rate before
+        # rebuilding the classes, then from the classes) a metropolis sweep is faster
+        if stale and worker.acceptance is not None and worker.acceptance > nfold.MAX_RATE:
+            return numba_sweep(worker, mag_field, interaction, beta, False)
+        if stale:
+            worker.classes = nfold.ini_classes(worker.config, worker.N)
+        if nfold.mean_rate(worker.classes[2], mag_field, interaction, beta, worker.N) > nfold.MAX_RATE:
+            return numba_sweep(worker, mag_field, interaction, beta, False)
+        flips = nfold.run(worker.config, *worker.classes, mag_field, interaction, beta, worker.N, worker.rng_states, worker.totals, 1.0, worker.halt)
+        worker.nfold_sweeps = worker.sweeps + 1
+        # flips per site, which is what the metropolis acceptance rate measures
+        return flips / worker.N**2
+
+    register('numba', numba_sweep)
+    register('msc', msc_sweep, lambda model_type, N: model_type == 0 and N % 64 == 0)
+    # the class arrays take 9 bytes a site, so the largest lattices are left out
+    register('nfold', nfold_sweep, lambda model_type, N: model_type == 0 and N <= 4096)
+
+# -----
+# NumPy
+# -----
+def numpy_sweep(worker, mag_field, interaction, beta, cluster):
+
+    # whole sublattice updates (no cluster moves), with a numpy generator seeded from the worker's streams
+    if getattr(worker, 'generator', None) is None:
+        worker.generator = np.random.default_rng(worker.rng_states)
+    acceptance = numpy_algo.sweep(worker.config, mag_field, interaction, beta, worker.N, worker.model_type, worker.generator, worker.totals)
+    # xy trig arrays no longer match the lattice
+    worker.trig = None
+    return acceptance
+
+register('numpy', numpy_sweep, lambda model_type, N: N % 2 == 0)
+
+# numba's kernels when it is available
+DEFAULT = 'numba' if numba is not None else 'numpy'
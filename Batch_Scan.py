@@ -0,0 +1,208 @@
+import argparse
+import csv
+import itertools
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import numba
+
+import Metro_Algo as metro
+import XY_Algo as xy
+import Analysis as analysis
+
+# ----------------------------------------------------------------------------------------------------
+# Headless phase diagram scan: runs the Metropolis sweeps over a grid of (T, B, J) points on a process
+# pool and writes each point's observables to a CSV file as soon as it finishes, no display needed
+# ----------------------------------------------------------------------------------------------------
+
+FIELDS = ['N', 'model_type', 'T', 'B', 'J',
+          'magnetisation', 'magnetisation_error', 'energy', 'energy_error',
+          'susceptibility', 'susceptibility_error', 'specific_heat', 'specific_heat_error', 'binder', 'binder_error',
+          'tau_M', 'tau_E', 'samples', 'burn_in', 'thinning', 'sweeps', 'seconds']
+
+# automatic runs burn in for at least this many autocorrelation times
+BURN_IN_TAUS = 20
+
+# -----
+# Chain
+# -----
+class Chain():
+
+    def __init__(self, N, model_type, T, B, J, seed):
+
+        self.N = N
+        self.model_type = model_type
+        self.B = B
+        self.J = J
+        # same T = 0 guard as the GUI
+        self.beta = 1 / max(T, 10 ** -5)
+        # ini_config draws from numpy's global generator
+        np.random.seed(seed)
+        self.config = metro.ini_config(N, model_type)
+        self.rng_states = metro.ini_rng(N, seed)
+        self.totals = metro.lattice_totals(self.config, N, model_type)
+        self.sweeps = 0
+
+        # xy sweeps use their own engine, with the proposal window only tuned during burn in
+        self.trig = xy.ini_trig(self.config, N) if model_type == 1 else None
+        self.window = 1.0
+
+    def run(self, sweeps, tune = False):
+
+        for i in range(sweeps):
+            if self.model_type == 1:
+                acceptance = xy.sweep(self.config, self.trig, self.B, self.J, self.beta, self.N, self.rng_states, self.totals, self.window)
+                if tune:
+                    self.window = xy.tune_window(self.window, acceptance)
+            else:
+                metro.checkerboard_sweep(self.config, self.B, self.J, self.beta, self.N, self.model_type, self.rng_states, self.totals)
+        self.sweeps += sweeps
+
+    def series(self, samples, thinning = 1):
+
+        # per site |M| and E read from the running totals every `thinning` sweeps
+        m = np.empty(samples)
+        e = np.empty(samples)
+        for i in range(samples):
+            self.run(thinning)
+            m[i], e[i] = metro.totals_observables(self.totals, self.B, self.J, self.N)
+
+        return m, e
+
+def run_point(N, model_type, T, B, J, burn_in, sweeps, seed, samples = None, max_sweeps = 10 ** 6):
+
+    start = time.perf_counter()
+    chain = Chain(N, model_type, T, B, J, seed)
+    chain.run(burn_in, tune = True)
+
+    # ----------------------
+    # Burn In & Measurements
+    # ----------------------
+    if samples is None:
+        # fixed length run, every sweep measured
+        thinning = 1
+        m, e = chain.series(sweeps)
+    else:
+        # a pilot run of `sweeps` sweeps estimates tau_int, which sizes the rest of the burn in and the
+        # thinning, then samples are added until the series holds `samples` independent measurements
+        m, e = chain.series(sweeps)
+        tau = max(analysis.integrated_time(m), analysis.integrated_time(e))
+        chain.run(max(0, min(int(np.ceil(BURN_IN_TAUS * tau)), max_sweeps) - chain.sweeps))
+        burn_in = chain.sweeps
+
+        thinning = max(1, int(np.ceil(tau)))
+        m, e = chain.series(samples, thinning)
+        while chain.sweeps < max_sweeps:
+            effective = min(analysis.effective_samples(m), analysis.effective_samples(e))
+            if effective >= samples:
+                break
+            more = int(np.ceil(len(m) * (samples / effective - 1)))
+            more = max(1, min(more, (max_sweeps - chain.sweeps) // thinning))
+            m_more, e_more = chain.series(more, thinning)
+            m = np.concatenate([m, m_more])
+            e = np.concatenate([e, e_more])
+
+    # ------------------------
+    # Observables With Errors
+    # ------------------------
+    # same estimators as the GUI's Accumulator, errors from a jackknife over blocks of the series
+    beta = chain.beta
+    magnetisation = analysis.jackknife(np.mean, m)
+    energy = analysis.jackknife(np.mean, e)
+    susceptibility = analysis.jackknife(lambda m: beta * N * N * np.var(m), m)
+    specific_heat = analysis.jackknife(lambda e: beta**2 * N * N * np.var(e), e)
+    binder = analysis.jackknife(lambda m: 1 - np.mean(m**4) / (3 * np.mean(m**2)**2) if np.any(m) else 0.0, m)
+
+    return {'N': N, 'model_type': model_type, 'T': T, 'B': B, 'J': J,
+            'magnetisation': magnetisation[0], 'magnetisation_error': magnetisation[1],
+            'energy': energy[0], 'energy_error': energy[1],
+            'susceptibility': susceptibility[0], 'susceptibility_error': susceptibility[1],
+            'specific_heat': specific_heat[0], 'specific_heat_error': specific_heat[1],
+            'binder': binder[0], 'binder_error': binder[1],
+            # autocorrelation times in sweeps
+            'tau_M': thinning * analysis.integrated_time(m),
+            'tau_E': thinning * analysis.integrated_time(e),
+            'samples': min(analysis.effective_samples(m), analysis.effective_samples(e)),
+            'burn_in': burn_in,
+            'thinning': thinning,
+            'sweeps': chain.sweeps,
+            'seconds': time.perf_counter() - start}
+
+def single_thread():
+
+    # each process sweeps on one core, the pool provides the parallelism
+    numba.set_num_threads(1)
+
+def scan(N, model_type, T_values, B_values, J_values, burn_in, sweeps, output, workers = None, seed = None, samples = None, max_sweeps = 10 ** 6):
+
+    # every (T, B, J) point gets its own 32 bit seed, so a scan is reproducible
+    points = list(itertools.product(T_values, B_values, J_values))
+    seeds = np.random.SeedSequence(seed).generate_state(len(points))
+
+    with open(output, 'w', newline = '') as file, ProcessPoolExecutor(max_workers = workers, initializer = single_thread) as pool:
+        writer = csv.DictWriter(file, fieldnames = FIELDS)
+        writer.writeheader()
+
+        futures = [pool.submit(run_point, N, model_type, T, B, J, burn_in, sweeps, int(s), samples, max_sweeps) for (T, B, J), s in zip(points, seeds)]
+
+        # results stream to disk in the order the points finish
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            writer.writerow(result)
+            file.flush()
+            print(f'[{done}/{len(points)}] T = {result["T"]:.3f}, B = {result["B"]:.3f}, J = {result["J"]:.3f}: '
+                  f'M = {result["magnetisation"]:.4f} ± {result["magnetisation_error"]:.4f}, E = {result["energy"]:.4f} ± {result["energy_error"]:.4f} '
+                  f'({result["sweeps"]} sweeps, {result["seconds"]:.1f} s)', flush = True)
+
+def grid(text):
+
+    # start:stop:num for an evenly spaced range, or a single value
+    parts = [float(x) for x in text.split(':')]
+    if len(parts) == 1:
+        return parts
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f'expected a value or start:stop:num, got {text!r}')
+    return list(np.linspace(parts[0], parts[1], int(parts[2])))
+
+# a value or start:stop:num range, which argparse would take for an option when it starts with a minus
+RANGE = re.compile(r'-[\d.]+(:-?[\d.]+:\d+)?$')
+
+def join_ranges(argv, options = ('--T', '--B', '--J')):
+
+    # '--B -1:1:21' -> '--B=-1:1:21', so a negative range is read as the option's value
+    joined = []
+    for arg in argv:
+        if joined and joined[-1] in options and RANGE.match(arg):
+            joined[-1] += '=' + arg
+        else:
+            joined.append(arg)
+    return joined
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'Scan the (T, B, J) phase diagram of the Ising or XY model without a display.')
+    parser.add_argument('--N', type = int, default = 64, help = 'lattice size (even)')
+    parser.add_argument('--model', type = int, choices = (0, 1), default = 0, help = '0 = Ising, 1 = XY')
+    parser.add_argument('--T', type = grid, default = grid('0:3.5:21'), help = 'temperatures, value or start:stop:num')
+    parser.add_argument('--B', type = grid, default = grid('-1:1:21'), help = 'magnetic fields, value or start:stop:num')
+    parser.add_argument('--J', type = grid, default = grid('1'), help = 'interaction strengths, value or start:stop:num')
+    parser.add_argument('--burn-in', type = int, default = 1000, help = 'sweeps before measuring (the minimum with --samples)')
+    parser.add_argument('--sweeps', type = int, default = 1000, help = 'measured sweeps per point (the pilot run with --samples)')
+    parser.add_argument('--samples', type = int, default = None, help = 'independent samples per point, burn in and thinning are sized from tau_int')
+    parser.add_argument('--max-sweeps', type = int, default = 10 ** 6, help = 'sweep limit per point with --samples')
+    parser.add_argument('--workers', type = int, default = None, help = 'processes in the pool (default: all cores)')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed for a reproducible scan')
+    parser.add_argument('--output', default = 'phase_scan.csv', help = 'CSV file the results are written to')
+    args = parser.parse_args(join_ranges(sys.argv[1:] if argv is None else argv))
+
+    if args.N % 2 != 0:
+        parser.error('--N must be even for the checkerboard sweep')
+
+    scan(args.N, args.model, args.T, args.B, args.J, args.burn_in, args.sweeps, args.output, args.workers, args.seed, args.samples, args.max_sweeps)
+
+
+if __name__ == '__main__':
+    main()
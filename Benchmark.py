@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import numba
+from numba import njit, prange
+
+import Metro_Algo as metro
+import Numpy_Algo as numpy_algo
+import Analysis as analysis
+import Backends
+from Sim_Worker import SimWorker
+
+# ----------------------------------------------------------------------------------------------------
+# Benchmarks of the sweep kernels, start up costs (cold import, JIT compile) and the display path,
+# written to JSON so runs can be diffed for regressions
+# ----------------------------------------------------------------------------------------------------
+
+SIZES = (64, 128, 256, 512, 1024, 2048)
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@njit
+def reject_samp_sweep(config, mag_field, interaction, beta, N, model_type):
+
+    # the original sweep, one reject_samp call per grid point
+    for i in range(N*N):
+        config = metro.reject_samp(config, mag_field, interaction, beta, N, model_type)
+
+    return config
+
+# ------------------------------------
+# Compact Ising Storage (no ghost cells)
+# ------------------------------------
+# the worker, the display and the snapshots all read int8 ghost cell lattices, this layout only
+# measures what dropping the ghost cells would save
+
+def to_compact(config, N):
+
+    # interior of a ghost cell configuration, periodic bcs come from the neighbour index instead
+    return config[1:N+1,1:N+1].astype(np.int8)
+
+@njit(nogil = True, cache = True)
+def neighbour_index(N):
+
+    # next and previous row/column of each index with the periodic wrap built in
+    nxt = np.empty(N, dtype = np.int64)
+    prv = np.empty(N, dtype = np.int64)
+    for x in range(N):
+        nxt[x] = (x + 1) % N
+        prv[x] = (x - 1) % N
+
+    return nxt, prv
+
+@njit(parallel = True, nogil = True, cache = True)
+def compact_sweep(spins, mag_field, interaction, beta, N, rng_states, totals):
+
+    # the red/black colouring only wraps consistently for even N
+    if N % 2 != 0:
+        raise ValueError('compact sweep needs an even lattice size N')
+
+    table = metro.acceptance_table(mag_field, interaction, beta)
+    nxt, prv = neighbour_index(N)
+
+    # ------------------------
+    # Compact Checkerboard Sweep
+    # ------------------------
+    # same moves, [Mx, My, bonds, field] totals and acceptance rate as checkerboard_sweep,
+    # an accepted flip writes one byte and no ghost cells
+    accepted = 0
+    for colour in range(2):
+        # changes to the running totals, reduced over the threads
+        d_mag = 0.0
+        d_bonds = 0.0
+
+        for I in prange(N):
+            # neighbouring rows looked up once per row
+            above = spins[prv[I]]
+            row = spins[I]
+            below = spins[nxt[I]]
+            for J in range((I + colour) % 2, N, 2):
+                old_spin = row[J]
+                # only the first and last column wrap around
+                left = row[J-1] if J > 0 else row[N-1]
+                right = row[J+1] if J < N - 1 else row[0]
+                neighbours = above[J] + below[J] + left + right
+                prob = table[int(old_spin + 1) // 2, int(neighbours + 4) // 2]
+                if prob >= 1.0 or prob >= metro.rand_uniform(rng_states, I):
+                    row[J] = -old_spin
+                    accepted += 1
+                    d_mag += -2 * old_spin
+                    d_bonds += -2 * old_spin * neighbours
+
+        totals[0] += d_mag
+        totals[2] += d_bonds
+        totals[3] += d_mag
+
+    return accepted / (N * N)
+
+def per_call(fn, min_time):
+
+    # seconds per call of fn(), repeated until at least min_time has passed
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+# -------------
+# Sweep Kernels
+# -------------
+
+def kernels(N, model_type, mag_field, interaction, beta):
+
+    # name -> one sweep of a fresh lattice, for every kernel that supports this model and size
+    config = metro.ini_config(N, model_type)
+    rng_states = metro.ini_rng(N, 0)
+    totals = metro.lattice_totals(config, N, model_type)
+    runs = {'sweep': lambda: metro.sweep(config, mag_field, interaction, beta, N, model_type),
+            'checkerboard_sweep': lambda: metro.checkerboard_sweep(config, mag_field, interaction, beta, N, model_type, rng_states, totals)}
+    if N % 2 == 0:
+        generator = np.random.default_rng(0)
+        runs['numpy_sweep'] = lambda: numpy_algo.sweep(config, mag_field, interaction, beta, N, model_type, generator, totals)
+
+    if model_type == 0:
+        import MSC_Algo as msc
+        packed = msc.pack(config[1:N+1,1:N+1], N)
+        spins = to_compact(config, N)
+        compact_totals = totals.copy()
+        cluster_size = np.zeros(2)
+        # wolff clusters only run in zero field
+        runs['cluster_sweep'] = lambda: metro.sweep(config, 0.0, interaction, beta, N, model_type, True, cluster_size)
+        runs['compact_sweep'] = lambda: compact_sweep(spins, mag_field, interaction, beta, N, rng_states, compact_totals)
+        if N % 64 == 0:
+            runs['msc_sweep'] = lambda: msc.sweep(packed, mag_field, interaction, beta, N, model_type)
+    else:
+        import XY_Algo as xy
+        trig = xy.ini_trig(config, N)
+        runs['xy_sweep'] = lambda: xy.sweep(config, trig, mag_field, interaction, beta, N, rng_states, totals, 0.5)
+
+    return runs
+
+def sweep_rates(sizes, min_time, mag_field = 0.1, interaction = 1.0, T = 2.269):
+
+    # spin flips attempted per second of each kernel, [model][kernel][N]
+    results = {}
+    for model_type in (0, 1):
+        model = results.setdefault(('ising', 'xy')[model_type], {})
+        for N in sizes:
+            for name, run in kernels(N, model_type, mag_field, interaction, 1 / T).items():
+                # first call compiles the kernel
+                run()
+                model.setdefault(name, {})[N] = N * N / per_call(run, min_time)
+                print(f'{("ising", "xy")[model_type]:>5} {name:>20} N = {N:>5}: {model[name][N]:.3e} flips/s', flush = True)
+
+    return results
+
+def reject_samp_rates(sizes, min_time, mag_field = 0.1, interaction = 1.0, T = 2.269):
+
+    # the original reject_samp loop, the baseline of the ising kernels
+    results = {}
+    for N in sizes:
+        config = metro.ini_config(N, 0)
+        run = lambda: reject_samp_sweep(config, mag_field, interaction, 1 / T, N, 0)
+        run()
+        results[N] = N * N / per_call(run, min_time)
+
+    return results
+
+# -------------------
+# Low T Flip Rates
+# -------------------
+
+def event_rates(N = 256, temperatures = (0.75, 1.0, 1.5, 2.269), min_time = 0.5, mag_field = 0.0, interaction = 1.0):
+
+    # accepted flips per second of the checkerboard metropolis sweep and of the rejection free
+    # n-fold way, from an ordered ising lattice, [T][kernel]
+    import NFold_Algo as nfold
+
+    results = {}
+    for T in temperatures:
+        beta = 1 / T
+        config = metro.ini_config(N, 0)
+        config[:] = 1
+        rng_states = metro.ini_rng(N, 0)
+        totals = metro.lattice_totals(config, N, 0)
+        flips = []
+        run = lambda: flips.append(N * N * metro.checkerboard_sweep(config, mag_field, interaction, beta, N, 0, rng_states, totals))
+        run()
+        flips.clear()
+        seconds = per_call(run, min_time)
+        point = results.setdefault(T, {})
+        point['checkerboard_sweep'] = np.mean(flips) / seconds
+
+        # the clock runs 100 sweeps a call, so each call is long enough to time at any T
+        config[:] = 1
+        totals = metro.lattice_totals(config, N, 0)
+        classes = nfold.ini_classes(config, N)
+        halt = np.zeros(1, dtype = np.bool_)
+        flips = []
+        run = lambda: flips.append(nfold.run(config, *classes, mag_field, interaction, beta, N, rng_states, totals, 100.0, halt))
+        run()
+        flips.clear()
+        seconds = per_call(run, min_time)
+        point['nfold'] = np.mean(flips) / seconds
+        print(f'ising T = {T:<6} accepted flips/s: checkerboard {point["checkerboard_sweep"]:.3e}, n-fold way {point["nfold"]:.3e}', flush = True)
+
+    return results
+
+# -----------------
+# Backend Agreement
+# -----------------
+
+def backend_agreement(N = 64, temperatures = (1.5, 2.0, 3.0), sweeps = 4000, burn_in = 1000, mag_field = 0.0, interaction = 1.0):
+
+    # <|M|> and <E> of every sweep backend from the same ordered start (so low T runs do not trap
+    # domain walls), with binning errors and the z-score of each against the default backend, [model][T][backend],
+    # the default temperatures stay clear of T_c where a few thousand sweeps underestimate the errors,
+    # ising lattices also run the default backend's wolff cluster sweeps (as 'wolff')
+    results = {}
+    for model_type in (0, 1):
+        model = results.setdefault(('ising', 'xy')[model_type], {})
+        runs = [(backend, backend, False) for backend in Backends.BACKENDS if Backends.BACKENDS[backend][1](model_type, N)]
+        if model_type == 0:
+            runs.append(('wolff', Backends.DEFAULT, True))
+        for T in temperatures:
+            point = model.setdefault(T, {})
+            for name, backend, cluster in runs:
+                config = metro.ini_config(N, model_type)
+                config[:] = 1 if model_type == 0 else 0
+                worker = SimWorker(config, N, model_type, metro.ini_rng(N, 1))
+                worker.set_params(mag_field, interaction, 1 / T, cluster, backend)
+                series = []
+                for sweep in range(burn_in + sweeps):
+                    worker.step()
+                    if sweep >= burn_in:
+                        series.append(metro.totals_observables(worker.totals, mag_field, interaction, N))
+                M, E = np.array(series).T
+                point[name] = {'M': M.mean(), 'M_error': analysis.binning_error(M),
+                                  'E': E.mean(), 'E_error': analysis.binning_error(E)}
+
+            reference = point[Backends.DEFAULT]
+            for backend, values in point.items():
+                for name in ('M', 'E'):
+                    error = np.hypot(values[name + '_error'], reference[name + '_error'])
+                    values['z_' + name] = 0.0 if backend == Backends.DEFAULT else (values[name] - reference[name]) / error
+                print(f'{("ising", "xy")[model_type]:>5} T = {T:<6} {backend:>6}: |M| = {values["M"]:.4f} +- {values["M_error"]:.4f} (z = {values["z_M"]:+.2f}), '
+                      f'E = {values["E"]:.4f} +- {values["E_error"]:.4f} (z = {values["z_E"]:+.2f})', flush = True)
+
+    return results
+
+# --------------
+# Start Up Costs
+# --------------
+
+COLD_START = '''
+import json, time
+start = time.perf_counter()
+import Metro_Algo as metro
+imported = time.perf_counter() - start
+config = metro.ini_config(64, {model_type})
+start = time.perf_counter()
+metro.sweep(config, 0.1, 1.0, 0.5, 64, {model_type})
+first = time.perf_counter() - start
+start = time.perf_counter()
+metro.sweep(config, 0.1, 1.0, 0.5, 64, {model_type})
+second = time.perf_counter() - start
+print(json.dumps({{'import': imported, 'first_sweep': first, 'compile': first - second}}))
+'''
+
+def cold_start(model_type):
+
+    # fresh interpreters with their own empty numba cache, so the first run pays the full compile
+    # cost and the second only loads what the first cached (the kernels are compiled with cache = True)
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, MPLBACKEND = 'Agg', NUMBA_CACHE_DIR = cache_dir)
+        for run in ('cold', 'warm_cache'):
+            output = subprocess.run([sys.executable, '-c', COLD_START.format(model_type = model_type)],
+                                    cwd = HERE, env = env, capture_output = True, text = True, check = True).stdout
+            results[run] = json.loads(output.strip().splitlines()[-1])
+
+    return results
+
+# ------------
+# Display Path
+# ------------
+
+def render_times(sizes, min_time, sim_box_dim = (500, 500)):
+
+    # seconds per frame of the IsingModel display path, drawn headless with Agg
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from Render import LatticeImage
+
+    results = {}
+    for model_type, cmap in ((0, matplotlib.colors.LinearSegmentedColormap.from_list('', ['#390A6B', '#FAF743'])), (1, 'hsv')):
+        model = results.setdefault(('ising', 'xy')[model_type], {})
+        for N in sizes:
+            fig = plt.figure(figsize = (sim_box_dim[0] / 100, sim_box_dim[1] / 100), dpi = 100)
+            ax = fig.add_subplot(111)
+            ax.axis('off')
+            lattice_image = LatticeImage(ax, fig.canvas, cmap, model_type)
+            config = metro.ini_config(N, model_type)
+            lattice_image.reset(config[1:N+1,1:N+1])
+            model[N] = per_call(lambda: lattice_image.show(config[1:N+1,1:N+1]), min_time)
+            plt.close(fig)
+            print(f'{("ising", "xy")[model_type]:>5} render N = {N:>5}: {1e3 * model[N]:.2f} ms/frame', flush = True)
+
+    return results
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'Benchmark the sweep kernels, start up and display path.')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = SIZES, help = 'lattice sizes N')
+    parser.add_argument('--min-time', type = float, default = 0.5, help = 'seconds spent timing each measurement')
+    parser.add_argument('--output', default = 'benchmark.json', help = 'JSON file the results are written to')
+    args = parser.parse_args(argv)
+
+    results = {'machine': {'python': platform.python_version(),
+                           'numpy': np.__version__,
+                           'numba': numba.__version__,
+                           'platform': platform.platform(),
+                           'threads': numba.get_num_threads()},
+               'cold_start': {'ising': cold_start(0), 'xy': cold_start(1)},
+               'reject_samp': reject_samp_rates(args.sizes, args.min_time),
+               'flips_per_second': sweep_rates(args.sizes, args.min_time),
+               'render_seconds': render_times(args.sizes, args.min_time),
+               'low_T_flips_per_second': event_rates(min_time = args.min_time),
+               'backend_agreement': backend_agreement()}
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent = 2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,40 @@ import tkinter as tk
 
 import math as math
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.colors
 
-import Metro_Algo as metro
+import os
+import time
 
+import Metro_Algo as metro
+from Sim_Worker import SimWorker, RateCounter, FrameScheduler
+from Render import LatticeImage
+from Snapshots import Trajectory
+from Phase_Cache import PhaseCache
+import Warm_Up
+import Backends
+from Profiler import Profiler
+
+# lattices are checkpointed here when they are replaced, one trajectory per model and size
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checkpoints')
+# observables and a warm lattice of every visited phase diagram point, kept between sessions
+CACHE_PATH = os.path.join(CHECKPOINT_DIR, 'phase_cache.pkl')
+# sweeps at one point before its averages are worth caching
+CACHE_SAMPLES = 200
+# seconds the pointer has to rest on a grid point before the simulation moves its cache point there
+POINTER_SETTLE = 0.25
+# lattice sizes in the menu, lattices larger than the display are block averaged and can be zoomed into,
+# xy lattices stop at 2048 as they are stored as float64 alongside their trig arrays
+SIZES = ('64', '128', '256', '512', '1024', '2048', '4096', '8192')
+XY_SIZES = SIZES[:6]
+# profiler traces are exported here, and the overlay is refreshed this often (seconds)
+TRACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces')
+OVERLAY_REFRESH = 0.5
+
+def model_sizes(model_type):
+    return XY_SIZES if model_type == 1 else SIZES
 
 # -----------
 # Root Window
@@ -48,7 +76,8 @@ class root(ctk.CTk):
         # ---------------------
         self.phase_grid_dim = [200, 200]
         self.grid_scalings = [3.5, 2]
-        self.Phase_Diagram = PhaseDiagram(self, self.phase_grid_dim, self.grid_scalings, self.color)
+        self.phase_cache = PhaseCache(CACHE_PATH, self.grid_scalings)
+        self.Phase_Diagram = PhaseDiagram(self, self.phase_grid_dim, self.grid_scalings, self.color, self.phase_cache)
 
         # co-ordinate state of the (T,B)-phase digram
         self.phase_state = [self.Phase_Diagram.x, self.Phase_Diagram.y]
@@ -58,7 +87,7 @@ class root(ctk.CTk):
         # -------------------
         self.sim_box_dim = [500, 500]
         self.cmap = matplotlib.colors.LinearSegmentedColormap.from_list("", ['#390A6B', "#FAF743"])
-        self.Model = Model(self, self.color, self.phase_state, self.grid_scalings, self.phase_grid_dim, self.sim_box_dim, self.switch.get(), self.cmap)
+        self.Model = Model(self, self.color, self.phase_state, self.grid_scalings, self.phase_grid_dim, self.sim_box_dim, self.switch.get(), self.cmap, self.phase_cache)
 
         # ----------------
         # Widget Placement
@@ -68,9 +97,19 @@ class root(ctk.CTk):
         self.Model.pack(side = 'top', pady = 5)
         self.Phase_Diagram.pack(side = 'top', pady = 5)
 
+        # checkpoint the running lattice on close
+        self.protocol('WM_DELETE_WINDOW', self.close)
+
         # run
         self.mainloop()
 
+    def close(self):
+        self.Model.ising_model.stop()
+        self.Model.ising_model.checkpoint()
+        self.Model.ising_model.cache_point()
+        self.phase_cache.save()
+        self.destroy()
+
     def switch_models(self):
         if self.switch.get():
             self.cmap = 'hsv'
@@ -79,17 +118,9 @@ class root(ctk.CTk):
             self.cmap = matplotlib.colors.LinearSegmentedColormap.from_list("", ['#390A6B', "#FAF743"])
             self.lbl_Model.configure(text = 'Ising Model')
 
-        # destroy then recreate model object with model_type changed
-        self.Model.destroy()
-        self.Model = Model(self, self.color, self.phase_state, self.grid_scalings, self.phase_grid_dim, self.sim_box_dim, self.switch.get(), self.cmap)
-
-        # redo widget placement
-        self.switch_Frame.pack_forget()
-        self.Model.pack_forget()
-        self.Phase_Diagram.pack_forget()
-        self.switch_Frame.pack(side = 'top')
-        self.Model.pack(side = 'top', pady = 5)
-        self.Phase_Diagram.pack(side = 'top', pady = 5)
+        # the model widget, figure and canvas are kept, only the lattice and its colours change
+        # (the current lattice is checkpointed so switching back resumes it)
+        self.Model.switch_model(self.switch.get(), self.cmap)
 
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
@@ -104,7 +135,7 @@ class root(ctk.CTk):
 # ------------
 class Model(ctk.CTkFrame):
 
-    def __init__(self, parent, color, state, grid_scalings, phase_grid_dim, sim_box_dim, model_type, cmap):
+    def __init__(self, parent, color, state, grid_scalings, phase_grid_dim, sim_box_dim, model_type, cmap, phase_cache):
 
         # __init__ from ctk.CTkframe()
         super().__init__(parent, fg_color = 'transparent')
@@ -146,21 +177,31 @@ class Model(ctk.CTkFrame):
         # ---------------------
         # Menu For Lattice Size
         # ---------------------
-        sizes = ('64', '128', '256', '512')
-        self.N_var = tk.IntVar(value = sizes[2])
-        sizes_combo = ctk.CTkComboBox(self,
-                                      button_color = '#FAF743', border_color = '#FAF743', fg_color = 'white', button_hover_color = '#DEDB26',
-                                      text_color = '#1B1B1C', dropdown_fg_color = 'white',
-                                      variable = self.N_var,
-                                      values = sizes,
-                                      command = lambda event : self.ising_model.refresh())
-
+        # changing the size carries the current lattice over
+        self.N_var = tk.IntVar(value = SIZES[2])
+        self.sizes_combo = ctk.CTkComboBox(self,
+                                           button_color = '#FAF743', border_color = '#FAF743', fg_color = 'white', button_hover_color = '#DEDB26',
+                                           text_color = '#1B1B1C', dropdown_fg_color = 'white',
+                                           variable = self.N_var,
+                                           values = model_sizes(self.model_type),
+                                           command = lambda event : self.ising_model.resize())
+
+        # ------------------------
+        # Menu For Sweep Backend
+        # ------------------------
+        backend_var = tk.StringVar(value = Backends.DEFAULT)
+        backend_menu = ctk.CTkOptionMenu(self,
+                                         button_color = '#FAF743', fg_color = '#FAF743', button_hover_color = '#DEDB26',
+                                         text_color = '#1B1B1C', dropdown_fg_color = 'white',
+                                         variable = backend_var,
+                                         values = list(Backends.BACKENDS),
+                                         command = lambda backend : setattr(self.ising_model, 'backend', backend))
 
         # ---------------------
         # Ising Model Generator
         # ---------------------
         self.ising_model_frame = ctk.CTkFrame(self, fg_color = 'white')
-        self.ising_model = IsingModel(self.ising_model_frame, self.phase_state, self.J_var, self.N_var, self.grid_scalings, self.color, self.phase_grid_dim, self.sim_box_dim, self.model_type, cmap)
+        self.ising_model = IsingModel(self.ising_model_frame, self.phase_state, self.J_var, self.N_var, self.grid_scalings, self.color, self.phase_grid_dim, self.sim_box_dim, self.model_type, cmap, phase_cache)
         # ------------
         # Button Frame
         # ------------
@@ -168,17 +209,31 @@ class Model(ctk.CTkFrame):
 
 
         J_frame.pack(side = 'right', padx = 0.02 * self.sim_box_dim[0])
-        sizes_combo.pack(pady = 5)
+        self.sizes_combo.pack(pady = 5)
+        backend_menu.pack(pady = 5)
         self.ising_model_frame.pack()
         self.ising_model.ctk_canvas.pack(padx = 5, pady = 5)
+        self.ising_model.lbl_observables.pack()
+        self.ising_model.lbl_rates.pack()
         btn_frame.pack(side = 'left', pady = 5)
         
+    def switch_model(self, model_type, cmap):
+
+        # the same widgets simulate the other model, the lattice size is kept where the model allows it
+        self.model_type = model_type
+        self.cmap = cmap
+        sizes = model_sizes(model_type)
+        self.sizes_combo.configure(values = sizes)
+        if str(self.N_var.get()) not in sizes:
+            self.N_var.set(int(sizes[-1]))
+        self.ising_model.switch_model(model_type, cmap)
+
 # -----------
 # Ising Model
 # -----------
 class IsingModel():
 
-    def __init__(self, parent, state, interaction, lattice_size, grid_scalings, color, phase_grid_dim, sim_box_dim, model_type, cmap):
+    def __init__(self, parent, state, interaction, lattice_size, grid_scalings, color, phase_grid_dim, sim_box_dim, model_type, cmap, phase_cache):
 
         # parent attribute
         self.parent = parent
@@ -197,9 +252,9 @@ class IsingModel():
         self.phase_state = state # encodes (T,B)-state
         self.grid_scalings = grid_scalings
 
-        # matplotlib figure
-        self.ax = plt.subplot(111)
-        self.fig = self.ax.figure
+        # matplotlib figure (not managed by pyplot, which is never imported)
+        self.fig = Figure()
+        self.ax = self.fig.add_subplot(111)
         self.ax.axis('off')
 
         # plot color same as root window color
@@ -217,29 +272,210 @@ class IsingModel():
 
         # color of the lattice px squares
         self.cmap = cmap
+        # the lattice is painted straight onto the canvas and blitted
+        self.lattice_image = LatticeImage(self.ax, self.canvas, self.cmap, self.model_type)
+
+        # sweeps/sec and frames/sec of the running simulation
+        self.lbl_rates = ctk.CTkLabel(self.parent, text = '', text_color = '#1B1B1C')
+        # live averages of the observables at the current (T,B,J)
+        self.lbl_observables = ctk.CTkLabel(self.parent, text = '', text_color = '#1B1B1C')
+        self.sweep_rate = RateCounter()
+        self.frame_rate = RateCounter()
+        self.frames = 0
+        # the worker sweeps as fast as it can, the display frame rate adapts to what
+        # drawing and sweeping cost at this lattice size
+        self.scheduler = FrameScheduler()
+
+        # pause attribute to start or stop the simulation
+        self.pause = True
+        # cluster attribute to use wolff cluster flips instead of metropolis
+        self.cluster = False
+        # sweep backend chosen in the menu, swapped for the default where it cannot run
+        self.backend = Backends.DEFAULT
+        # background simulation worker and the scheduled display update
+        self.worker = None
+        self.after_id = None
+        # stage timings of the display loop and the worker's sweeps, shown over the lattice when toggled on
+        self.profiler = Profiler()
+        self.show_profile = False
+        self.overlay_time = 0.0
+
+        # cached points of the phase diagram, the point being simulated and
+        # the observables shown for it until the worker has its own averages
+        self.phase_cache = phase_cache
+        self.cache_key = None
+        self.cached = None
+        # grid point the pointer is on and since when, while it settles
+        self.pending_key = None
+        self.pending_time = 0.0
 
         # restarts to an initial configuration
         self.refresh()
 
-        # pause attribute to start or stop the simulation
-        self.pause = False
-
     # ---------------------
     # Initial Configuration
     # ---------------------
-    def refresh(self):
+    def refresh(self, resume = True):
+
+        # the old lattice's worker has to finish before it is replaced,
+        # and its state is kept so it can be resumed later
+        running = not self.pause
+        self.stop()
+        self.checkpoint()
+
+        N = self.N_var.get()
+        path = self.checkpoint_path(N)
+        if resume and os.path.exists(path) and len(Trajectory(path)) > 0:
+            # carries on from the last checkpoint of this model and size
+            state = Trajectory(path).resume()
+            self.config = state['config']
+            self.rng_states = state['rng_states']
+            sweeps, window = state['sweep'], state['window']
+        else:
+            # creates an initial congfiguration with given N
+            self.config = metro.ini_config(N, self.model_type)
+            # random number stream for each lattice row of the checkerboard sweep
+            self.rng_states = metro.ini_rng(N)
+            sweeps, window = 0, 1.0
+        self.new_lattice(N, sweeps, window)
+
+        if running:
+            self.play()
+
+    def resize(self):
+
+        # the lattice carries over to the new size (tiled when growing, cropped when shrinking)
+        # rather than restarting from random spins, so it is already close to equilibrium
+        N = self.N_var.get()
+        if self.worker is None or N == self.worker.N:
+            return
+        running = not self.pause
+        self.stop()
+        self.checkpoint()
+        self.cache_point()
+
+        self.config = metro.resize_config(self.worker.config, self.worker.N, N)
+        self.rng_states = metro.ini_rng(N)
+        self.new_lattice(N, self.worker.sweeps, self.worker.window)
+
+        if running:
+            self.play()
+
+    def switch_model(self, model_type, cmap):
+
+        # the figure and canvas are reused for the other model, which resumes its last checkpoint
+        running = not self.pause
+        self.stop()
+        self.checkpoint()
+        self.cache_point()
+        # the old model's lattice is checkpointed already
+        self.worker = None
 
-        # creates an initial congfiguration with given N
-        self.config = metro.ini_config(self.N_var.get(), self.model_type)
+        self.model_type = model_type
+        self.cmap = cmap
+        self.lattice_image.set_colours(cmap, model_type)
+        self.refresh()
 
-        # displays plot
-        self.lattice_plot = self.ax.imshow(self.config, cmap = self.cmap)
-        self.canvas.draw()
+        if running:
+            self.play()
+
+    def new_lattice(self, N, sweeps, window):
+
+        # a worker for self.config, with the sweep count and xy window carried over
+        self.worker = SimWorker(self.config, N, self.model_type, self.rng_states, sweeps, window)
+        # timings of the old lattice size no longer apply
+        self.profiler.reset()
+        self.worker.profiler = self.profiler
+        # the new lattice is only cached once it has been swept at one point
+        self.cache_key = None
+        self.cached = None
+        self.pending_key = None
+
+        # displays plot (interior of the lattice, without the ghost cells)
+        self.lattice_image.reset(self.config[1:N+1,1:N+1])
+
+    # -----------
+    # Checkpoints
+    # -----------
+    def checkpoint_path(self, N):
+        return os.path.join(CHECKPOINT_DIR, f'{("ising", "xy")[self.model_type]}_{N}.snap')
+
+    def checkpoint(self):
+
+        # appends the stopped worker's lattice to the trajectory of its size
+        if self.worker is not None and self.worker.sweeps > 0:
+            N = self.worker.N
+            self.worker.checkpoint(Trajectory(self.checkpoint_path(N), N, self.model_type))
+
+    # ------------------
+    # Phase Diagram Cache
+    # ------------------
+    def cache_point(self):
+
+        # stores the averages and lattice of the current point, once enough sweeps have been measured at it
+        if self.cache_key is None or self.worker is None or self.worker.accumulator.count < CACHE_SAMPLES:
+            return
+        # the worker may already be measuring another point (the parameters follow the pointer before
+        # the cache point does), whose averages and lattice must not be stored under this one's key
+        measured = self.worker.measured_params
+        if measured is None:
+            return
+        B, J, beta = measured
+        if self.phase_cache.key(self.model_type, self.worker.N, J, 1 / beta, B) != self.cache_key:
+            return
+        entry = dict(zip(('M', 'E', 'chi', 'C', 'U'), self.worker.measurements()))
+        entry['count'] = self.worker.accumulator.count
+        entry['config'] = self.worker.snapshot()
+        entry['window'] = self.worker.window
+        self.phase_cache.put(self.cache_key, entry)
+
+    def move_point(self, key, T, B, J):
+
+        # the simulation moves to another grid point, a cached point restarts from its warm lattice
+        self.cache_point()
+        entry = self.phase_cache.get(key)
+        if entry is not None and entry['config'] is not None and entry['config'].shape == self.config.shape:
+            running = self.worker.running()
+            self.worker.stop()
+            self.config = entry['config'].copy()
+            self.worker = SimWorker(self.config, self.N_var.get(), self.model_type, self.rng_states, self.worker.sweeps, entry['window'])
+            self.worker.profiler = self.profiler
+            if running:
+                # the first sweep runs straight away, at the new point
+                self.pass_params(T, B)
+                self.worker.start()
+        self.cached = self.phase_cache.estimate(self.model_type, self.N_var.get(), J, T, B)
+        self.cache_key = key
+        self.phase_cache.notify(key)
+
+    # ---------------------
+    # Start/Stop Simulation
+    # ---------------------
+    def play(self):
+
+        # starts the worker sweeping and the display loop
+        if self.pause:
+            self.pause = False
+            # the worker's first sweep runs straight away, so it needs the current parameters first
+            self.pass_params(*self.phase_point())
+            self.worker.start()
+            self.update()
+
+    def stop(self):
+
+        # stops the display loop and waits for the worker's last sweep
+        self.pause = True
+        if self.after_id is not None:
+            self.parent.after_cancel(self.after_id)
+            self.after_id = None
+        self.scheduler.reset()
+        if self.worker is not None:
+            self.worker.stop()
 
     # --------------
     # Run Simulation
     # --------------
-    def update(self):
+    def phase_point(self):
 
         # states on the coordinate grid is written in term of (x,y) px
         # scale the states to coincide with (T,B) ranges
@@ -250,21 +486,104 @@ class IsingModel():
         if T == 0:
             T = 10 ** -5
 
-        # performs a Metropolis Algo sweep
-        self.config = metro.sweep(self.config, B, self.J_var.get(), 1 / T, self.N_var.get(), self.model_type)
-        # updates data
-        self.lattice_plot.set_data(self.config)
-        # displays results on canvas
-        self.canvas.draw()
+        return T, B
+
+    def pass_params(self, T, B):
+
+        # (B, J, beta, cluster, backend) of the next sweeps
+        backend = Backends.select(self.backend, self.model_type, self.N_var.get())
+        self.worker.set_params(B, self.J_var.get(), 1 / T, self.cluster, backend)
+
+    def update(self):
+
+        frame_start = time.perf_counter()
+        # how late this update ran after it was due, a backlog of after callbacks shows up here
+        if self.scheduler.due is not None:
+            self.profiler.record('late', self.scheduler.due)
+        stage = frame_start
+        T, B = self.phase_point()
+
+        # a new grid point may have a warm lattice and observables cached
+        N = self.N_var.get()
+        key = self.phase_cache.key(self.model_type, N, self.J_var.get(), T, B)
+        if self.cache_key is None:
+            self.cache_key = key
+            self.phase_cache.notify(key)
+        elif key != self.cache_key:
+            # dragging across the grid only changes the parameters, the cache point
+            # moves (and a warm lattice is loaded) once the pointer has settled
+            if key != self.pending_key:
+                # the point being left is stored before the worker is given the new parameters
+                if self.pending_key is None:
+                    self.cache_point()
+                self.pending_key = key
+                self.pending_time = frame_start
+            elif frame_start - self.pending_time >= POINTER_SETTLE:
+                self.move_point(key, T, B, self.J_var.get())
+        else:
+            self.pending_key = None
+
+        # passes the current parameters to the worker sweeping in the background
+        self.pass_params(T, B)
+        stage = self.profiler.record('params', stage)
+
+        # latest lattice published by the worker, however many sweeps it has done since the last frame,
+        # nothing is redrawn until the worker has published a new one
+        shown = self.worker.fresh
+        if shown:
+            self.config = self.worker.snapshot()
+            stage = self.profiler.record('snapshot', stage)
+            # blits the lattice onto the canvas
+            self.lattice_image.show(self.config[1:N+1,1:N+1])
+            stage = self.profiler.record('show', stage)
+            self.frames += 1
+
+        # simulation and display rates are measured separately
+        sweep_rate = self.sweep_rate.update(self.worker.sweeps)
+        frame_rate = self.frame_rate.update(self.frames)
+        per_frame = sweep_rate / frame_rate if frame_rate > 0 else 0.0
+        self.lbl_rates.configure(text = f'{sweep_rate:.0f} sweeps/s    {frame_rate:.0f} fps    {per_frame:.1f} sweeps/frame')
+        M, E, chi, C, U = self.worker.measurements()
+        source = ''
+        if self.worker.accumulator.count < CACHE_SAMPLES and self.cached is not None:
+            # cached (or interpolated) values until the worker's own averages settle
+            M, E, chi, C, U = (self.cached[name] for name in ('M', 'E', 'chi', 'C', 'U'))
+            source = '    (cached)'
+        if self.worker.schedule:
+            # a large jump in (T, B) is still being annealed
+            source = '    (annealing)'
+        self.lbl_observables.configure(text = f'⟨|M|⟩ = {M:.3f}    ⟨E⟩ = {E:.3f}    χ = {chi:.2f}    C = {C:.2f}    U₄ = {U:.3f}{source}')
+        stage = self.profiler.record('labels', stage)
+
+        # the overlay text only changes every so often, it is drawn with the next frames
+        if self.show_profile and stage - self.overlay_time >= OVERLAY_REFRESH:
+            self.lattice_image.set_overlay(self.profiler.summary())
+            self.overlay_time = stage
+        frame_end = self.profiler.record('frame', frame_start)
 
         # checks whether to keep running (update itself)
         if self.pause == False:
-            # different sweep rates for size of model
-            match self.N_var.get():
-                case 512:
-                    self.parent.after(25, self.update)
-                case _:
-                    self.parent.after(20, self.update)
+            # waits until the scheduler's next frame is due
+            delay = self.scheduler.schedule(frame_start, frame_end, shown, self.worker.sweep_time)
+            self.after_id = self.parent.after(delay, self.update)
+
+    # --------
+    # Profiler
+    # --------
+    def toggle_profile(self, show):
+
+        # shows or hides the p50/p99 overlay, straight away also while paused
+        self.show_profile = show
+        self.lattice_image.set_overlay(self.profiler.summary() if show else None)
+        self.lattice_image.view_changed()
+
+    def export_trace(self):
+
+        # everything recorded since the lattice was last replaced, as a Chrome trace
+        os.makedirs(TRACE_DIR, exist_ok = True)
+        path = os.path.join(TRACE_DIR, f'{("ising", "xy")[self.model_type]}_{self.N_var.get()}_{time.strftime("%Y%m%d_%H%M%S")}.json')
+        self.profiler.export(path)
+        return path
 
 # ------------
 # Button Frame
@@ -296,6 +615,16 @@ class buttons(ctk.CTkFrame):
                                  width = 35, height = 35,
                                  command = lambda : pause(model))
 
+        # ------------
+        # Reset Button
+        # ------------
+        resetBtn = ctk.CTkButton(self,
+                                 text = '↺',
+                                 fg_color = '#390A6B', hover_color = '#17022E',
+                                 border_width = 2, border_color = 'white',
+                                 width = 35, height = 35,
+                                 command = lambda : model.refresh(resume = False))
+
         # ------------
         # Crit Button
         # ------------
@@ -307,18 +636,54 @@ class buttons(ctk.CTkFrame):
                                  font = ('Arial', 12, 'bold'),
                                  command = lambda : critical_temp(model, grid_scalings, grid_dim))
         
+        # --------------
+        # Cluster Switch
+        # --------------
+        self.cluster_var = tk.IntVar(value = 0)
+        clusterSwitch = ctk.CTkSwitch(self,
+                                      text = 'Cluster',
+                                      text_color = 'white',
+                                      progress_color = '#390A6B',
+                                      variable = self.cluster_var,
+                                      command = lambda : cluster(model))
+
+        # ------------------------
+        # Profiler Switch & Trace
+        # ------------------------
+        self.profile_var = tk.IntVar(value = 0)
+        profileSwitch = ctk.CTkSwitch(self,
+                                      text = 'Profiler',
+                                      text_color = 'white',
+                                      progress_color = '#390A6B',
+                                      variable = self.profile_var,
+                                      command = lambda : model.toggle_profile(bool(self.profile_var.get())))
+        traceBtn = ctk.CTkButton(self,
+                                 text = 'Export Trace',
+                                 fg_color = '#390A6B', hover_color = '#17022E',
+                                 border_width = 2, border_color = 'white',
+                                 width = 35, height = 35,
+                                 font = ('Arial', 12, 'bold'),
+                                 command = lambda : export_trace(model))
+
         # --------------------
         # Button Functionality
         # --------------------
 
         # start simulation
         def start(model):
-            model.pause = False
-            model.update()
+            model.play()
 
         # pause simulation
         def pause(model):
-            model.pause = True
+            model.stop()
+
+        # switch between wolff cluster and metropolis sweeps
+        def cluster(model):
+            model.cluster = bool(self.cluster_var.get())
+
+        # writes the profiler's trace and shows where it went
+        def export_trace(model):
+            traceBtn.configure(text = os.path.basename(model.export_trace()))
 
         def critical_temp(model, grid_scalings, grid_dim):
             crit_temp = 2 / math.log(1+math.sqrt(2))
@@ -330,10 +695,14 @@ class buttons(ctk.CTkFrame):
         # Button Placement
         # ----------------
         self.columnconfigure((0,1,2,3,4,5,6, 7), weight = 1, uniform = 'a')
-        self.rowconfigure(0, weight = 1, uniform = 'a')
+        self.rowconfigure((0, 1), weight = 1, uniform = 'a')
         startBtn.grid(row = 0, column = 0, sticky = 'w', padx = 10)
         pauseBtn.grid(row = 0, column = 1, sticky = 'w')
+        resetBtn.grid(row = 0, column = 2, sticky = 'w')
+        clusterSwitch.grid(row = 0, column = 3, columnspan = 3)
         critBtn.grid(row = 0, column = 7, sticky = 'e')
+        profileSwitch.grid(row = 1, column = 0, columnspan = 3, sticky = 'w', padx = 10, pady = 5)
+        traceBtn.grid(row = 1, column = 3, columnspan = 5, sticky = 'e', pady = 5)
 
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
@@ -348,7 +717,7 @@ class buttons(ctk.CTkFrame):
 # ----------------
 class PhaseDiagram(ctk.CTkFrame):
 
-    def __init__(self, parent, phase_grid_dim, grid_scalings, color):
+    def __init__(self, parent, phase_grid_dim, grid_scalings, color, phase_cache):
 
         # __init__ from ctk.CTkframe()
         super().__init__(parent, fg_color = 'transparent')
@@ -364,6 +733,8 @@ class PhaseDiagram(ctk.CTkFrame):
         self.x = tk.DoubleVar()
         self.y = tk.DoubleVar()
         self.coordGrid = CoordinateGrid(self, self.x, self.y, self.phase_grid_dim, self.grid_scalings)
+        # cached |M| of the simulated model, size and J drawn under the grid
+        phase_cache.listeners.append(self.coordGrid.draw_heatmap)
         self.grid_scalings = self.coordGrid.grid_scalings
  
         # initially start at critical point
@@ -436,6 +807,9 @@ class CoordinateGrid(ctk.CTkFrame):
         for div in y_divisions:
             self.canvas.create_line((0, div), (self.grid_dim[0], div), fill = 'lightgray', width = 1)
 
+        # colours of the cached |M| heatmap, light enough for the grid and pointer to stay visible
+        self.heatmap_cmap = matplotlib.colormaps['Purples']
+
         # grid scaling of (x,y) px co-ordinates to (T,B) phase diagram co-ordinates
         # 1 px in the x-direction is 3.5 units of temperature
         # 1 px in the y-direction is 2 units of magnetic field strength
@@ -466,29 +840,49 @@ class CoordinateGrid(ctk.CTkFrame):
         self.point = self.canvas.create_oval((self.crit_temp_px - self.dot_size/2, self.grid_dim[1]/2 - self.dot_size/2,
                                               self.crit_temp_px + self.dot_size/2, self.grid_dim[1]/2 + self.dot_size/2),
                                               fill = 'black')
+        # at most one redraw is pending, however often the pointer moves before it runs
+        self.redraw_id = None
+        # any change of the co-ordinates (mouse, sliders, critical T button) moves the pointer
+        self.x.trace_add('write', lambda *args : self.moves_pointer())
+        self.y.trace_add('write', lambda *args : self.moves_pointer())
+
         # moving pointer with mouse
         self.canvas.bind('<ButtonPress-1>', lambda event : self.canvas.bind('<Motion>', self.pointer_moves_sliders))
         self.canvas.bind('<ButtonRelease-1>', lambda event : self.canvas.unbind('<Motion>'))
 
+    def draw_heatmap(self, phase_cache, key):
+
+        # one square of cached |M| around each cached grid intersection, below the grid lines
+        self.canvas.delete('heatmap')
+        heatmap = phase_cache.heatmap(*key[:3])
+        cell = [self.grid_dim[0] / (self.num_div[0] - 1), self.grid_dim[1] / (self.num_div[1] - 1)]
+        for i, j in zip(*np.nonzero(~np.isnan(heatmap))):
+            x = i * cell[0]
+            y = self.grid_dim[1] - j * cell[1]
+            self.canvas.create_rectangle((x - cell[0]/2, y - cell[1]/2, x + cell[0]/2, y + cell[1]/2),
+                                         fill = matplotlib.colors.to_hex(self.heatmap_cmap(0.1 + 0.6 * heatmap[i,j])),
+                                         width = 0, tags = 'heatmap')
+        self.canvas.tag_lower('heatmap')
+
     def pointer_moves_sliders(self, event):
         
-        # max is used to ensure no negative pixels (no negative Temp)
-        self.x.set(max(event.x, 0))
-        self.y.set(self.grid_dim[1] - event.y)
-
-        # move pointer
-        self.moves_pointer()
+        # clamped to the grid (no negative Temp), the traces move the pointer
+        self.x.set(min(max(event.x, 0), self.grid_dim[0]))
+        self.y.set(min(max(self.grid_dim[1] - event.y, 0), self.grid_dim[1]))
 
     def moves_pointer(self):
-        
-        # deletes previous pointer as you move it
-        self.canvas.delete(self.point)
-        # creates new pointer at current slider/mouse location
-        self.point = self.canvas.create_oval((self.x.get() - self.dot_size/2, self.grid_dim[1] - self.y.get() - self.dot_size/2,
-                                              self.x.get() + self.dot_size/2, self.grid_dim[1] - self.y.get() + self.dot_size/2),
-                                              fill = 'black')
 
-        self.after(100, self.moves_pointer)
+        # one redraw once tk is idle, moves until then are coalesced into it
+        if self.redraw_id is None:
+            self.redraw_id = self.after_idle(self.redraw_pointer)
+
+    def redraw_pointer(self):
+
+        # moves the existing pointer to the current slider/mouse location
+        self.redraw_id = None
+        x = self.x.get()
+        y = self.grid_dim[1] - self.y.get()
+        self.canvas.coords(self.point, x - self.dot_size/2, y - self.dot_size/2, x + self.dot_size/2, y + self.dot_size/2)
 
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
@@ -496,4 +890,7 @@ class CoordinateGrid(ctk.CTkFrame):
 
 
 # run program
-root()
\ No newline at end of file
+if __name__ == '__main__':
+    # kernels compile in the background while the window is built
+    Warm_Up.start()
+    root()
\ No newline at end of file
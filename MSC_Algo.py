@@ -0,0 +1,172 @@
+import numpy as np
+from numba import njit, prange
+
+import Metro_Algo as metro
+
+# ----------------------------------------------
+# Multi-Spin Coded Ising Model (64 spins per word)
+# ----------------------------------------------
+# spin (i,j) is bit b of word (i,k) with j = k + b*W and W = N/64 words per row,
+# bit 1 is spin +1 and bit 0 is spin -1
+# the 64 spins of a word are W columns apart, so the left/right neighbours of a
+# word are the same bits of the next word along (rotated by one bit at the wrap)
+# and the up/down neighbours are the same word in the next row
+
+# acceptance probabilities are resolved to 2^-ACCEPT_BITS
+ACCEPT_BITS = 24
+
+ALL_BITS = np.uint64(0xFFFFFFFFFFFFFFFF)
+EVEN_BITS = np.uint64(0x5555555555555555)
+ODD_BITS = np.uint64(0xAAAAAAAAAAAAAAAA)
+
+def ini_config(N, model_type):
+
+    # multi-spin coding only applies to the two state ising spins
+    if model_type != 0:
+        raise ValueError('multi-spin coding only supports the Ising model (model_type 0)')
+    if N % 64 != 0:
+        raise ValueError('multi-spin coding needs N to be a multiple of 64')
+
+    # random initial configuration
+    return pack(np.random.choice(np.array([-1, 1], dtype = np.int8), (N, N)), N)
+
+def pack(spins, N):
+
+    # N x N spins of -1/1 into an (N, N/64) uint64 array
+    W = N // 64
+    bits = (spins[:N,:N] > 0).reshape(N, 64, W).astype(np.uint64)
+    return np.bitwise_or.reduce(bits << np.arange(64, dtype = np.uint64)[None,:,None], axis = 1)
+
+def unpack(config, N):
+
+    # (N, N/64) uint64 array back into N x N int8 spins of -1/1
+    bits = (config[:,None,:] >> np.arange(64, dtype = np.uint64)[None,:,None]) & np.uint64(1)
+    return (2 * bits.reshape(N, N) - 1).astype(np.int8)
+
+@njit(parallel = True, nogil = True, cache = True)
+def unpack_into(config, packed, N):
+
+    # packed spins written into a ghost cell configuration, without the temporaries of unpack
+    W = N // 64
+    for I in prange(N):
+        for k in range(W):
+            word = packed[I,k]
+            for b in range(64):
+                config[I+1, k + b*W + 1] = 2 * np.int8((word >> np.uint64(b)) & np.uint64(1)) - 1
+
+    return metro.ghost_cells(config, N)
+
+@njit(nogil = True, cache = True)
+def colour_mask(I, k, colour, W):
+
+    # bits of word (I,k) with (I + j) % 2 == colour
+    if W % 2 == 0:
+        # every column in the word has the same parity
+        return ALL_BITS if (I + k) % 2 == colour else np.uint64(0)
+
+    # parity alternates bit by bit
+    return EVEN_BITS if (I + k) % 2 == colour else ODD_BITS
+
+@njit(nogil = True, cache = True)
+def accept_mask(candidates, threshold, planes):
+
+    # lanes whose ACCEPT_BITS bit random number (one bit from each plane) is
+    # below threshold, compared one bit at a time from the least significant
+    below = np.uint64(0)
+    for q in range(ACCEPT_BITS):
+        if (threshold >> np.uint64(q)) & np.uint64(1):
+            below = ~planes[q] | below
+        else:
+            below = ~planes[q] & below
+
+    return candidates & below
+
+@njit(parallel = True, nogil = True, cache = True)
+def sweep(config, mag_field, interaction, beta, N, model_type):
+
+    if model_type != 0:
+        raise ValueError('multi-spin coding only supports the Ising model (model_type 0)')
+
+    W = N // 64
+    full = np.uint64(1 << ACCEPT_BITS)
+
+    # ------------------
+    # Acceptance Table
+    # ------------------
+    # spin +1 with a anti-aligned neighbours has neighbour sum 4 - 2a, spin -1 has 2a - 4
+    # thresholds[spin bit, a] is the acceptance probability in units of 2^-ACCEPT_BITS
+    table = metro.acceptance_table(mag_field, interaction, beta)
+    thresholds = np.empty((2, 5), dtype = np.uint64)
+    for a in range(5):
+        thresholds[0,a] = np.uint64(table[0,a] * (1 << ACCEPT_BITS))
+        thresholds[1,a] = np.uint64(table[1,4-a] * (1 << ACCEPT_BITS))
+
+    # fast stream for each row seeded from numpy's generator, so np.random.seed still applies
+    rng_states = np.random.randint(1, 2**62, N).astype(np.uint64)
+
+    # --------------------------
+    # Checkerboard Sweep of Words
+    # --------------------------
+    for colour in range(2):
+        for I in prange(N):
+            above = config[(I - 1) % N]
+            row = config[I]
+            below = config[(I + 1) % N]
+            planes = np.empty(ACCEPT_BITS, dtype = np.uint64)
+
+            for k in range(W):
+                mask = colour_mask(I, k, colour, W)
+                if mask == 0:
+                    continue
+
+                spins = row[k]
+                # neighbouring columns, rotated by a bit where the row wraps around
+                if k > 0:
+                    left = row[k-1]
+                else:
+                    left = (row[W-1] << np.uint64(1)) | (row[W-1] >> np.uint64(63))
+                if k < W - 1:
+                    right = row[k+1]
+                else:
+                    right = (row[0] >> np.uint64(1)) | (row[0] << np.uint64(63))
+
+                # count anti-aligned neighbours of every lane as the bits (a2 a1 a0)
+                x1 = spins ^ above[k]
+                x2 = spins ^ below[k]
+                x3 = spins ^ left
+                x4 = spins ^ right
+                s1 = x1 ^ x2
+                c1 = x1 & x2
+                s2 = x3 ^ x4
+                c2 = x3 & x4
+                a0 = s1 ^ s2
+                c3 = s1 & s2
+                a1 = c1 ^ c2 ^ c3
+                a2 = (c1 & c2) | (c1 & c3) | (c2 & c3)
+                counts = (~a0 & ~a1 & ~a2, a0 & ~a1 & ~a2, ~a0 & a1 & ~a2, a0 & a1 & ~a2, ~a0 & ~a1 & a2)
+
+                # ------------------
+                # Rejection Sample
+                # ------------------
+                # every lane shares the same random bit planes, each lane is in exactly one class
+                flips = np.uint64(0)
+                drawn = False
+                for spin_bit in range(2):
+                    spin_mask = spins if spin_bit == 1 else ~spins
+                    for a in range(5):
+                        candidates = mask & spin_mask & counts[a]
+                        if candidates == 0:
+                            continue
+                        threshold = thresholds[spin_bit,a]
+                        if threshold >= full:
+                            flips |= candidates
+                        elif threshold > 0:
+                            if not drawn:
+                                for q in range(ACCEPT_BITS):
+                                    planes[q] = metro.rand_bits(rng_states, I)
+                                drawn = True
+                            flips |= accept_mask(candidates, threshold, planes)
+
+                row[k] = spins ^ flips
+
+    return config
@@ -1,6 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from numba import njit
+from numba import njit, prange
 
 # --------------------
 # Metropolis Algorithm
@@ -11,26 +10,73 @@ def ini_config(N, model_type):
     # random initial configuration
     # check what type of model
     if model_type == 0:
-        config = np.random.choice([-1, 1],(N+2, N+2))
+        config = np.random.choice(np.array([-1, 1], dtype = np.int8),(N+2, N+2))
     elif model_type == 1:
         config = np.random.uniform(0,1,(N+2, N+2))
 
-    # temp holds all initial config data
-    temp_config = config[1:N+1,1:N+1].copy()
+    # the ghost cell are changed to match periodic bcs and wraps around lattice
+    config = ghost_cells(config, N)
+
+    return config
+
+@njit(nogil = True, cache = True)
+def ghost_cells(config, N):
 
     # -------------------
     # Ghost Cells
     # -------------------
-    # the ghost cell are changed to match periodic bcs and wraps around lattice
-    for x in range(N):
-        config[0,x+1] = temp_config[-1,x]
-        config[-1,x+1] = temp_config[0,x]
-        config[x+1,0] = temp_config[x,-1]
-        config[x+1,-1] = temp_config[x,0]
+    # copy the opposite edge of the lattice into each ghost row and column
+    for x in range(1, N+1):
+        config[0,x] = config[N,x]
+        config[N+1,x] = config[1,x]
+        config[x,0] = config[x,N]
+        config[x,N+1] = config[x,1]
 
     return config
 
-@njit
+def ini_rng(N, seed = None):
+
+    # one xorshift stream per lattice row, so a sweep gives the same result
+    # however the rows are shared out between threads
+    rng_states = np.random.SeedSequence(seed).generate_state(N, dtype = np.uint64)
+    # a xorshift stream stays at zero forever
+    rng_states[rng_states == 0] = 1
+
+    return rng_states
+
+def resize_config(config, N, new_N, mode = 'tile'):
+
+    # carries an N x N lattice over to size new_N instead of starting again from random spins,
+    # 'tile' repeats the periodic lattice (seamlessly, keeping its correlation length) or crops it,
+    # 'upsample' blows every spin up into a block (or keeps every few spins when shrinking)
+    if mode == 'tile':
+        index = np.arange(new_N) % N
+    elif mode == 'upsample':
+        index = np.arange(new_N) * N // new_N
+    spins = config[1:N+1,1:N+1][np.ix_(index, index)]
+
+    # wrap padding rebuilds the ghost cells
+    return np.pad(spins, 1, mode = 'wrap')
+
+@njit(nogil = True, cache = True)
+def rand_bits(rng_states, k):
+
+    # xorshift64* step of stream k, returns 64 random bits
+    x = rng_states[k]
+    x ^= x >> np.uint64(12)
+    x ^= x << np.uint64(25)
+    x ^= x >> np.uint64(27)
+    rng_states[k] = x
+
+    return x * np.uint64(0x2545F4914F6CDD1D)
+
+@njit(nogil = True, cache = True)
+def rand_uniform(rng_states, k):
+
+    # top 53 bits of the next random word as a float in [0,1)
+    return (rand_bits(rng_states, k) >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+@njit(nogil = True, cache = True)
 def periodic_bcs(config, I, J, N):
 
     # if chosen grid point is adjacent to ghostcell adjust bcs wrap accordingly
@@ -38,26 +84,26 @@ def periodic_bcs(config, I, J, N):
     # adjacent row
     if I == 1:
         config[-1,J] = config[I,J]
-    elif I == N+1:
+    elif I == N:
         config[0,J] = config[I,J]
 
     # adjacent column
     if J == 1:
         config[I,-1] = config[I,J]
-    elif J == N+1:
+    elif J == N:
         config[I,0] = config[I,J]
 
     return config
 
-@njit
+@njit(nogil = True, cache = True)
 def reject_samp(config, mag_field, interaction, beta, N, model_type):
     
     # --------------------
     # Random Flip Change
     # --------------------
     # randomly choose a grid point (I,J) in lattice to flip/change spin
-    I = np.random.randint(1, N+2)
-    J = np.random.randint(1, N+2)
+    I = np.random.randint(1, N+1)
+    J = np.random.randint(1, N+1)
     old_spin = config[I,J]
 
     # neighbours of the chosen point
@@ -96,14 +142,349 @@ def reject_samp(config, mag_field, interaction, beta, N, model_type):
 
     return config
 
-@njit
-def sweep(config, mag_field, interaction, beta, N, model_type):
+@njit(nogil = True, cache = True)
+def sweep(config, mag_field, interaction, beta, N, model_type, cluster = False, cluster_size = None):
 
     # ----------
     # One Sweep
     # ----------
     # after one sweep, each grid point has been flipped and accepted/rejected once
+    # ferromagnetic ising in zero field can use wolff cluster flips instead
+    # (cluster_size carries the sites and clusters of earlier wolff sweeps from one to the next),
+    # a field would reject the flip of the percolating majority cluster almost every time in the
+    # ordered phase, mixing far slower than metropolis, so B != 0 always sweeps with metropolis
+    if model_type == 0 and cluster and interaction >= 0 and mag_field == 0:
+        if cluster_size is None:
+            return wolff_sweep(config, mag_field, interaction, beta, N, np.zeros(2))
+        return wolff_sweep(config, mag_field, interaction, beta, N, cluster_size)
+    # the ising model has its own allocation free kernel
+    if model_type == 0:
+        return ising_sweep(config, mag_field, interaction, beta, N)
+
     for i in range(N*N):
         config = reject_samp(config, mag_field, interaction, beta, N, model_type)
 
     return config
+
+@njit(nogil = True, cache = True)
+def acceptance_table(mag_field, interaction, beta):
+
+    # ------------------
+    # Acceptance Table
+    # ------------------
+    # flipping spin s with neighbour sum h changes the energy by 2s(Jh - B),
+    # so there are only 2 x 5 possible acceptance probabilities
+    # table[(s+1)//2, (h+4)//2]
+    table = np.empty((2, 5))
+    for a in range(2):
+        spin = 2 * a - 1
+        for b in range(5):
+            neighbours = 2 * b - 4
+            delta_energy = 2 * spin * (interaction * neighbours - mag_field)
+            if delta_energy <= 0:
+                table[a,b] = 1.0
+            else:
+                table[a,b] = np.exp(-beta * delta_energy)
+
+    return table
+
+@njit(nogil = True, cache = True)
+def ising_sweep(config, mag_field, interaction, beta, N):
+
+    # fast stream seeded from numpy's generator, so np.random.seed still applies
+    rng_state = np.full(1, np.random.randint(1, 2**62), dtype = np.uint64)
+
+    return stream_sweep(config, mag_field, interaction, beta, N, 0, rng_state, 0)
+
+@njit(nogil = True, cache = True)
+def stream_sweep(config, mag_field, interaction, beta, N, model_type, rng_states, k):
+
+    # boltzmann factors are worked out once per sweep
+    table = acceptance_table(mag_field, interaction, beta)
+
+    # -----------------
+    # One Sweep
+    # -----------------
+    # same moves as reject_samp, reading the neighbours in place and drawing
+    # every random number from stream k
+    for i in range(N*N):
+        # one random draw picks the grid point (I,J)
+        site = int(rand_uniform(rng_states, k) * N * N)
+        I = site // N + 1
+        J = site % N + 1
+        old_spin = config[I,J]
+
+        # ising flips are looked up in the acceptance table
+        if model_type == 0:
+            neighbours = config[I+1,J] + config[I-1,J] + config[I,J+1] + config[I,J-1]
+            prob = table[int(old_spin + 1) // 2, int(neighbours + 4) // 2]
+            if prob >= 1.0 or prob >= rand_uniform(rng_states, k):
+                config[I,J] = -old_spin
+                periodic_bcs(config, I, J, N)
+            continue
+
+        # calculate energy difference before and after change
+        new_spin = rand_uniform(rng_states, k)
+        delta_energy = mag_field * (np.cos(new_spin) - np.cos(old_spin))
+        for neighbour in (config[I+1,J], config[I-1,J], config[I,J+1], config[I,J-1]):
+            delta_energy -= interaction * (np.cos(2 * np.pi * (new_spin - neighbour)) - np.cos(2 * np.pi * (old_spin - neighbour)))
+
+        # accept if energy efficient or with the boltzmann probability
+        if delta_energy <= 0 or np.exp(-beta * delta_energy) >= rand_uniform(rng_states, k):
+            config[I,J] = new_spin
+            periodic_bcs(config, I, J, N)
+
+    return config
+
+@njit(nogil = True, cache = True)
+def wolff_sweep(config, mag_field, interaction, beta, N, cluster_size):
+
+    # fast stream seeded from numpy's generator, so np.random.seed still applies
+    rng_state = np.full(1, np.random.randint(1, 2**62), dtype = np.uint64)
+
+    # probability of adding an aligned neighbour to the cluster
+    bond_prob = 1 - np.exp(-2 * beta * interaction)
+
+    # sites in the current cluster, also used as the queue of sites to grow from
+    cluster = np.empty(N*N, dtype = np.int64)
+    in_cluster = np.zeros(N*N, dtype = np.bool_)
+
+    # -------------
+    # Wolff Sweep
+    # -------------
+    # enough clusters to visit about as many sites as one metropolis sweep, counted from the mean cluster
+    # size of all earlier sweeps at these parameters (cluster_size = [sites, clusters], zeros before the
+    # first): stopping once the sweep's own clusters add up to N*N, or counting from a mean that follows
+    # the last few sweeps, biases every per sweep measurement towards the current clusters' sizes
+    clusters = 1 if cluster_size[1] <= 0 else max(1, int(round(N * N * cluster_size[1] / cluster_size[0])))
+    visited = 0
+    for k in range(clusters):
+        site = int(rand_uniform(rng_state, 0) * N * N)
+        spin = config[site // N + 1, site % N + 1]
+        cluster[0] = site
+        in_cluster[site] = True
+        size = 1
+        head = 0
+
+        # iterative breadth first growth, no recursion however large the cluster
+        while head < size:
+            I = cluster[head] // N
+            J = cluster[head] % N
+            head += 1
+            for neighbour in ((I + 1) % N * N + J, (I - 1) % N * N + J, I * N + (J + 1) % N, I * N + (J - 1) % N):
+                if not in_cluster[neighbour] and config[neighbour // N + 1, neighbour % N + 1] == spin:
+                    if rand_uniform(rng_state, 0) < bond_prob:
+                        in_cluster[neighbour] = True
+                        cluster[size] = neighbour
+                        size += 1
+
+        # in zero field (the only one sweep runs wolff in) every cluster is flipped
+        for c in range(size):
+            I = cluster[c] // N + 1
+            J = cluster[c] % N + 1
+            in_cluster[cluster[c]] = False
+            config[I,J] = -spin
+            periodic_bcs(config, I, J, N)
+
+        visited += size
+
+    # the mean settles as the sweeps add up, the caller resets it when (T, B, J) change
+    cluster_size[0] += visited
+    cluster_size[1] += clusters
+
+    return config
+
+@njit(parallel = True, nogil = True, cache = True)
+def checkerboard_sweep(config, mag_field, interaction, beta, N, model_type, rng_states, totals):
+
+    # the red/black colouring only wraps consistently for even N
+    if N % 2 != 0:
+        raise ValueError('checkerboard sweep needs an even lattice size N')
+
+    # boltzmann factors for the ising flips
+    table = acceptance_table(mag_field, interaction, beta)
+
+    # -------------------
+    # Checkerboard Sweep
+    # -------------------
+    # moves accepted over the whole sweep, for the metropolis acceptance rate
+    accepted = 0
+    # sites of one colour only have neighbours of the other colour, so a whole
+    # colour can be updated at once with the rows shared between threads
+    for colour in range(2):
+        # changes to the running totals, reduced over the threads
+        d_mag_x = 0.0
+        d_mag_y = 0.0
+        d_bonds = 0.0
+        d_field = 0.0
+
+        for I in prange(1, N+1):
+            for J in range(1 + (I + 1 + colour) % 2, N+1, 2):
+                old_spin = config[I,J]
+
+                # ising flips are looked up in the acceptance table, the indices are cast as numba
+                # also compiles this branch for float xy lattices, which can't index an array
+                if model_type == 0:
+                    neighbours = config[I+1,J] + config[I-1,J] + config[I,J+1] + config[I,J-1]
+                    prob = table[int(old_spin + 1) // 2, int(neighbours + 4) // 2]
+                    if prob >= 1.0 or prob >= rand_uniform(rng_states, I-1):
+                        config[I,J] = -old_spin
+                        accepted += 1
+                        d_mag_x += -2 * old_spin
+                        d_bonds += -2 * old_spin * neighbours
+                        d_field += -2 * old_spin
+                    continue
+
+                # calculate energy difference before and after change
+                new_spin = rand_uniform(rng_states, I-1)
+                delta_field = np.cos(new_spin) - np.cos(old_spin)
+                delta_bonds = 0.0
+                for neighbour in (config[I+1,J], config[I-1,J], config[I,J+1], config[I,J-1]):
+                    delta_bonds += np.cos(2 * np.pi * (new_spin - neighbour)) - np.cos(2 * np.pi * (old_spin - neighbour))
+                delta_energy = mag_field * delta_field - interaction * delta_bonds
+
+                # accept if energy efficient or with the boltzmann probability
+                if delta_energy <= 0 or np.exp(-beta * delta_energy) >= rand_uniform(rng_states, I-1):
+                    config[I,J] = new_spin
+                    accepted += 1
+                    d_mag_x += np.cos(2 * np.pi * new_spin) - np.cos(2 * np.pi * old_spin)
+                    d_mag_y += np.sin(2 * np.pi * new_spin) - np.sin(2 * np.pi * old_spin)
+                    d_bonds += delta_bonds
+                    d_field += delta_field
+
+        totals[0] += d_mag_x
+        totals[1] += d_mag_y
+        totals[2] += d_bonds
+        totals[3] += d_field
+
+        # ghost cells only change between the two half sweeps
+        ghost_cells(config, N)
+
+    # returns the metropolis acceptance rate, the lattice and totals are updated in place
+    return accepted / (N * N)
+
+# ---------------------
+# Replica Batch
+# ---------------------
+
+def ini_batch(R, N, model_type):
+
+    # R independent random initial configurations stacked into one (R, N+2, N+2) array
+    return np.stack([ini_config(N, model_type) for r in range(R)])
+
+@njit(parallel = True, nogil = True, cache = True)
+def batch_sweep(configs, mag_fields, interaction, betas, N, model_type, rng_states):
+
+    # one sweep of every replica r at its own (beta[r], B[r]),
+    # each replica on its own thread with its own random number stream
+    for r in prange(configs.shape[0]):
+        stream_sweep(configs[r], mag_fields[r], interaction, betas[r], N, model_type, rng_states, r)
+
+    return configs
+
+@njit(nogil = True, cache = True)
+def observables(config, mag_field, interaction, N, model_type):
+
+    # per site magnetisation and energy of the whole lattice
+    return totals_observables(lattice_totals(config, N, model_type), mag_field, interaction, N)
+
+@njit(parallel = True, nogil = True, cache = True)
+def batch_observables(configs, mag_fields, interaction, N, model_type):
+
+    # magnetisation and energy per site of every replica
+    R = configs.shape[0]
+    magnetisation = np.empty(R)
+    energy = np.empty(R)
+    for r in prange(R):
+        magnetisation[r], energy[r] = observables(configs[r], mag_fields[r], interaction, N, model_type)
+
+    return magnetisation, energy
+
+# ---------------------------------------
+# Running Totals & Streaming Observables
+# ---------------------------------------
+# totals = [Mx, My, bonds, field] over the whole lattice, with
+# E = B * field - J * bonds, so the totals stay valid when B or J change
+# and sweeps can update them from each accepted move in O(1)
+
+@njit(nogil = True, cache = True)
+def lattice_totals(config, N, model_type):
+
+    # full O(N^2) count, each bond is counted once through its right and lower neighbour
+    totals = np.zeros(4)
+    for I in range(1, N+1):
+        for J in range(1, N+1):
+            spin = config[I,J]
+            if model_type == 0:
+                totals[0] += spin
+                totals[2] += spin * (config[I+1,J] + config[I,J+1])
+                totals[3] += spin
+            else:
+                totals[0] += np.cos(2 * np.pi * spin)
+                totals[1] += np.sin(2 * np.pi * spin)
+                totals[2] += np.cos(2 * np.pi * (spin - config[I+1,J])) + np.cos(2 * np.pi * (spin - config[I,J+1]))
+                totals[3] += np.cos(spin)
+
+    return totals
+
+@njit(nogil = True, cache = True)
+def totals_observables(totals, mag_field, interaction, N):
+
+    # per site |M| and E from the running totals
+    magnetisation = np.sqrt(totals[0]**2 + totals[1]**2) / (N*N)
+    energy = (mag_field * totals[3] - interaction * totals[2]) / (N*N)
+
+    return magnetisation, energy
+
+class Accumulator():
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+
+        # Welford running mean and sum of squared deviations of |M| and E
+        self.count = 0
+        self.mean_M = 0.0
+        self.m2_M = 0.0
+        self.mean_E = 0.0
+        self.m2_E = 0.0
+        # running means of M^2 and M^4 for the Binder cumulant
+        self.mean_M2 = 0.0
+        self.mean_M4 = 0.0
+
+    def add(self, magnetisation, energy):
+
+        # O(1) update with one sample of the per site |M| and E
+        self.count += 1
+        delta = magnetisation - self.mean_M
+        self.mean_M += delta / self.count
+        self.m2_M += delta * (magnetisation - self.mean_M)
+
+        delta = energy - self.mean_E
+        self.mean_E += delta / self.count
+        self.m2_E += delta * (energy - self.mean_E)
+
+        self.mean_M2 += (magnetisation**2 - self.mean_M2) / self.count
+        self.mean_M4 += (magnetisation**4 - self.mean_M4) / self.count
+
+    def susceptibility(self, beta, N):
+
+        # beta N^2 (<M^2> - <|M|>^2)
+        if self.count < 2:
+            return 0.0
+        return beta * N * N * self.m2_M / self.count
+
+    def specific_heat(self, beta, N):
+
+        # beta^2 N^2 (<E^2> - <E>^2)
+        if self.count < 2:
+            return 0.0
+        return beta**2 * N * N * self.m2_E / self.count
+
+    def binder(self):
+
+        # U4 = 1 - <M^4> / (3 <M^2>^2)
+        if self.count == 0 or self.mean_M2 == 0:
+            return 0.0
+        return 1 - self.mean_M4 / (3 * self.mean_M2**2)
@@ -0,0 +1,168 @@
+import numpy as np
+from numba import njit
+
+import Metro_Algo as metro
+
+# ----------------------------------------------------------------------------------------------------
+# Rejection free n-fold way (Bortz-Kalos-Lebowitz) kinetic Monte Carlo of the Ising model: each spin is
+# in one of 10 classes by its sign and neighbour sum, and all spins of a class flip at the same metropolis
+# rate, so every event picks a class in proportion to its total rate, flips a uniformly random spin of
+# it and advances a physical clock (in sweeps) by an exponential waiting time, with no rejected moves
+# ----------------------------------------------------------------------------------------------------
+# the sites (I-1)*N + (J-1) are kept in one array sorted into contiguous buckets by class, so moving
+# a site to another class takes at most CLASSES - 1 swaps across the bucket boundaries
+
+CLASSES = 10
+# mean flips per site per sweep above which the checkerboard metropolis sweep does the same physical
+# time faster (Benchmark.event_rates), so the n-fold way only runs in the low T regime it is meant for
+MAX_RATE = 0.01
+
+@njit(nogil = True, cache = True)
+def site_class(config, I, J):
+
+    # 5 * (spin up) + (neighbour sum + 4) / 2
+    neighbours = config[I+1,J] + config[I-1,J] + config[I,J+1] + config[I,J-1]
+    return 5 * (config[I,J] > 0) + (neighbours + 4) // 2
+
+@njit(nogil = True, cache = True)
+def class_rates(mag_field, interaction, beta):
+
+    # metropolis flip rate of each class, with the energy change 2s(Jh - B) of flipping spin s
+    rates = np.empty(CLASSES)
+    for c in range(CLASSES):
+        spin = 1 if c >= 5 else -1
+        neighbours = 2 * (c % 5) - 4
+        rates[c] = min(1.0, np.exp(-beta * 2 * spin * (interaction * neighbours - mag_field)))
+
+    return rates
+
+@njit(nogil = True, cache = True)
+def mean_rate(start, mag_field, interaction, beta, N):
+
+    # expected flips per site in one sweep of physical time, from the class populations
+    rates = class_rates(mag_field, interaction, beta)
+    total = 0.0
+    for c in range(CLASSES):
+        total += (start[c+1] - start[c]) * rates[c]
+
+    return total / (N*N)
+
+@njit(nogil = True, cache = True)
+def ini_classes(config, N):
+
+    # (order, position, start, classes): the sites sorted by class, the index of each site in order,
+    # the first index of each class (start[CLASSES] = N*N) and the class of each site
+    classes = np.empty(N*N, dtype = np.int8)
+    start = np.zeros(CLASSES + 1, dtype = np.int64)
+    for I in range(1, N+1):
+        for J in range(1, N+1):
+            c = site_class(config, I, J)
+            classes[(I-1)*N + J-1] = c
+            start[c+1] += 1
+    for c in range(CLASSES):
+        start[c+1] += start[c]
+
+    order = np.empty(N*N, dtype = np.int32)
+    position = np.empty(N*N, dtype = np.int32)
+    fill = start[:CLASSES].copy()
+    for site in range(N*N):
+        c = classes[site]
+        order[fill[c]] = site
+        position[site] = fill[c]
+        fill[c] += 1
+
+    return order, position, start, classes
+
+@njit(nogil = True, cache = True)
+def swap(order, position, p, q):
+
+    # exchanges the sites at indices p and q of order
+    a = order[p]
+    b = order[q]
+    order[p] = b
+    order[q] = a
+    position[b] = p
+    position[a] = q
+
+@njit(nogil = True, cache = True)
+def move(site, new_class, order, position, start, classes):
+
+    # walks the site across the bucket boundaries into its new class
+    c = classes[site]
+    while c < new_class:
+        # to the end of its bucket, which then ends one index earlier
+        swap(order, position, position[site], start[c+1] - 1)
+        start[c+1] -= 1
+        c += 1
+    while c > new_class:
+        # to the start of its bucket, which then starts one index later
+        swap(order, position, position[site], start[c])
+        start[c] += 1
+        c -= 1
+    classes[site] = new_class
+
+@njit(nogil = True, cache = True)
+def run(config, order, position, start, classes, mag_field, interaction, beta, N, rng_states, totals, duration, halt):
+
+    # flips spins until the clock has advanced by duration sweeps (or halt[0] is set, so a worker
+    # can be stopped part way), keeping the ghost cells and [Mx, My, bonds, field] totals up to
+    # date, returns the number of flips
+    rates = class_rates(mag_field, interaction, beta)
+    weights = np.empty(CLASSES)
+    time = 0.0
+    events = 0
+
+    while not halt[0]:
+        # total rate of each class
+        total = 0.0
+        for c in range(CLASSES):
+            weights[c] = (start[c+1] - start[c]) * rates[c]
+            total += weights[c]
+        if total <= 0.0:
+            break
+
+        # exponential waiting time, an event past the end is dropped (the next one is drawn afresh)
+        time += -np.log(1.0 - metro.rand_uniform(rng_states, 0)) / total
+        if time > duration:
+            break
+
+        # class in proportion to its total rate, the remainder then picks a uniform site of it
+        target = metro.rand_uniform(rng_states, 0) * total
+        c = 0
+        while c < CLASSES - 1 and target >= weights[c]:
+            target -= weights[c]
+            c += 1
+        # rounding can run past the last class with any rate
+        while weights[c] == 0.0:
+            c -= 1
+        k = min(start[c] + int(target / rates[c]), start[c+1] - 1)
+        site = order[k]
+
+        # -----
+        # Flip
+        # -----
+        I = site // N + 1
+        J = site % N + 1
+        spin = config[I,J]
+        neighbours = config[I+1,J] + config[I-1,J] + config[I,J+1] + config[I,J-1]
+        config[I,J] = -spin
+        # ghost copies of edge spins
+        if I == 1:
+            config[N+1,J] = -spin
+        if I == N:
+            config[0,J] = -spin
+        if J == 1:
+            config[I,N+1] = -spin
+        if J == N:
+            config[I,0] = -spin
+        totals[0] += -2 * spin
+        totals[2] += -2 * spin * neighbours
+        totals[3] += -2 * spin
+        events += 1
+
+        # the site and its four neighbours change class
+        move(site, site_class(config, I, J), order, position, start, classes)
+        for I2, J2 in ((I % N + 1, J), ((I - 2) % N + 1, J), (I, J % N + 1), (I, (J - 2) % N + 1)):
+            move((I2-1)*N + J2-1, site_class(config, I2, J2), order, position, start, classes)
+
+    return events
@@ -0,0 +1,103 @@
+import numpy as np
+
+# ----------------------------------------------------------------------------------------------------
+# Pure NumPy checkerboard sweep, for machines without numba: the lattice layout (ghost cells), energy
+# conventions and running totals are the same as Metro_Algo's checkerboard_sweep, but each colour is
+# updated as a whole with neighbour sums from shifted slices, one batched draw of random numbers and
+# masked flips
+# ----------------------------------------------------------------------------------------------------
+
+def ini_config(N, model_type):
+
+    # random initial configuration, as Metro_Algo.ini_config
+    if model_type == 0:
+        config = np.random.choice(np.array([-1, 1], dtype = np.int8), (N+2, N+2))
+    elif model_type == 1:
+        config = np.random.uniform(0, 1, (N+2, N+2))
+
+    return ghost_cells(config, N)
+
+def ghost_cells(config, N):
+
+    # copy the opposite edge of the lattice into each ghost row and column
+    config[0,1:N+1] = config[N,1:N+1]
+    config[N+1,1:N+1] = config[1,1:N+1]
+    config[1:N+1,0] = config[1:N+1,N]
+    config[1:N+1,N+1] = config[1:N+1,1]
+
+    return config
+
+def lattice_totals(config, N, model_type):
+
+    # [Mx, My, bonds, field] of the whole lattice, as Metro_Algo.lattice_totals
+    spins = config[1:N+1,1:N+1]
+    down = config[2:N+2,1:N+1]
+    right = config[1:N+1,2:N+2]
+    if model_type == 0:
+        total = float(spins.sum(dtype = np.int64))
+        bonds = float((spins * (down + right)).sum(dtype = np.int64))
+        return np.array([total, 0.0, bonds, total])
+
+    return np.array([np.cos(2 * np.pi * spins).sum(),
+                     np.sin(2 * np.pi * spins).sum(),
+                     (np.cos(2 * np.pi * (spins - down)) + np.cos(2 * np.pi * (spins - right))).sum(),
+                     np.cos(spins).sum()])
+
+def sublattices(config, N, colour):
+
+    # the sites of one colour as two strided views (odd and even lattice rows), each with the
+    # views of its up, down, left and right neighbours
+    for row, col in ((1, 1 + colour), (2, 2 - colour)):
+        yield (config[row:N+1:2, col:N+1:2],
+               config[row-1:N:2, col:N+1:2], config[row+1:N+2:2, col:N+1:2],
+               config[row:N+1:2, col-1:N:2], config[row:N+1:2, col+1:N+2:2])
+
+def sweep(config, mag_field, interaction, beta, N, model_type, rng, totals):
+
+    # the red/black colouring only wraps consistently for even N
+    if N % 2 != 0:
+        raise ValueError('checkerboard sweep needs an even lattice size N')
+
+    # ising acceptance probabilities, indexed by 5 * (spin > 0) + (neighbours + 4) / 2
+    neighbours = np.arange(-4, 5, 2)
+    table = np.concatenate([np.minimum(1.0, np.exp(-beta * 2 * s * (interaction * neighbours - mag_field))) for s in (-1, 1)])
+
+    # -------------------
+    # Checkerboard Sweep
+    # -------------------
+    accepted = 0
+    for colour in range(2):
+        for spins, up, down, left, right in sublattices(config, N, colour):
+            randoms = rng.random(spins.shape)
+
+            if model_type == 0:
+                h = up + down + left + right
+                accept = randoms < table[5 * (spins > 0) + (h + 4) // 2]
+                flipped = spins * accept
+                totals[0] += -2.0 * flipped.sum(dtype = np.int64)
+                totals[2] += -2.0 * (flipped * h).sum(dtype = np.int64)
+                totals[3] += -2.0 * flipped.sum(dtype = np.int64)
+                np.negative(spins, out = spins, where = accept)
+                accepted += np.count_nonzero(accept)
+                continue
+
+            # xy spins propose a uniformly random new angle, as Metro_Algo's checkerboard_sweep
+            new_spins = rng.random(spins.shape)
+            delta_field = np.cos(new_spins) - np.cos(spins)
+            delta_bonds = sum(np.cos(2 * np.pi * (new_spins - n)) - np.cos(2 * np.pi * (spins - n)) for n in (up, down, left, right))
+            delta_energy = mag_field * delta_field - interaction * delta_bonds
+            with np.errstate(over = 'ignore'):
+                accept = (delta_energy <= 0) | (randoms < np.exp(-beta * delta_energy))
+
+            totals[0] += (np.cos(2 * np.pi * new_spins[accept]) - np.cos(2 * np.pi * spins[accept])).sum()
+            totals[1] += (np.sin(2 * np.pi * new_spins[accept]) - np.sin(2 * np.pi * spins[accept])).sum()
+            totals[2] += delta_bonds[accept].sum()
+            totals[3] += delta_field[accept].sum()
+            np.copyto(spins, new_spins, where = accept)
+            accepted += np.count_nonzero(accept)
+
+        # ghost cells only change between the two half sweeps
+        ghost_cells(config, N)
+
+    # returns the metropolis acceptance rate, as Metro_Algo's checkerboard_sweep
+    return accepted / (N * N)
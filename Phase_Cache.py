@@ -0,0 +1,121 @@
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+# ----------------------------------------------------------------------------------------------------
+# Phase diagram cache: equilibrated observables and a warm lattice for each visited (T, B) grid point,
+# keyed on (model_type, N, J, T, B) quantised to the coordinate grid, least recently used entries are
+# evicted once the lattices exceed a size cap, and the cache is kept on disk between sessions
+# ----------------------------------------------------------------------------------------------------
+
+OBSERVABLES = ('M', 'E', 'chi', 'C', 'U')
+
+def lattice_bytes(entry):
+    return 0 if entry['config'] is None else entry['config'].nbytes
+
+class PhaseCache():
+
+    def __init__(self, path = None, grid_scalings = (3.5, 2), num_div = (21, 21), J_div = 21, max_bytes = 64 * 2**20):
+
+        # (T, B) snap to the grid line intersections, J to its own divisions of [0, 1]
+        self.path = path
+        self.grid_scalings = grid_scalings
+        self.num_div = num_div
+        self.J_div = J_div
+        self.max_bytes = max_bytes
+
+        # key -> entry, least recently used first
+        self.entries = OrderedDict()
+        self.bytes = 0
+        # called with the key of every point that is looked up or stored
+        self.listeners = []
+
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as file:
+                for key, entry in pickle.load(file).items():
+                    self.put(key, entry)
+
+    # ------------
+    # Quantisation
+    # ------------
+    def cell(self, T, B):
+
+        # grid intersection (i, j) nearest to (T, B), T in [0, T_max] and B in [-B_range/2, B_range/2]
+        i = int(round(T / self.grid_scalings[0] * (self.num_div[0] - 1)))
+        j = int(round((B / self.grid_scalings[1] + 0.5) * (self.num_div[1] - 1)))
+        return min(max(i, 0), self.num_div[0] - 1), min(max(j, 0), self.num_div[1] - 1)
+
+    def key(self, model_type, N, J, T, B):
+        return (model_type, N, int(round(J * (self.J_div - 1)))) + self.cell(T, B)
+
+    # ---------
+    # LRU Cache
+    # ---------
+    def get(self, key):
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+
+        # entry holds the OBSERVABLES, the sample count and a warm 'config' (with its xy 'window'),
+        # the cache keeps its own copy of the lattice unless it would take over a quarter of the cap,
+        # in which case only the observables are kept
+        config = entry['config']
+        entry = dict(entry, config = config.copy() if config is not None and config.nbytes <= self.max_bytes // 4 else None)
+        if key in self.entries:
+            self.bytes -= lattice_bytes(self.entries.pop(key))
+        self.entries[key] = entry
+        self.bytes += lattice_bytes(entry)
+
+        # evicts the least recently used lattices, always keeping the newest
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            old_key, old_entry = self.entries.popitem(last = False)
+            self.bytes -= lattice_bytes(old_entry)
+
+        self.notify(key)
+
+    def estimate(self, model_type, N, J, T, B):
+
+        # observables at (T, B), from the point's own entry or bilinearly interpolated
+        # between the four grid points around it when all of them are cached
+        entry = self.get(self.key(model_type, N, J, T, B))
+        if entry is not None:
+            return {name: entry[name] for name in OBSERVABLES}
+
+        x = min(max(T / self.grid_scalings[0], 0), 1) * (self.num_div[0] - 1)
+        y = min(max(B / self.grid_scalings[1] + 0.5, 0), 1) * (self.num_div[1] - 1)
+        i, j = min(int(x), self.num_div[0] - 2), min(int(y), self.num_div[1] - 2)
+        prefix = (model_type, N, int(round(J * (self.J_div - 1))))
+        corners = [self.entries.get(prefix + (i + di, j + dj)) for di in (0, 1) for dj in (0, 1)]
+        if any(corner is None for corner in corners):
+            return None
+
+        dx, dy = x - i, y - j
+        weights = [(1 - dx) * (1 - dy), (1 - dx) * dy, dx * (1 - dy), dx * dy]
+        return {name: sum(w * corner[name] for w, corner in zip(weights, corners)) for name in OBSERVABLES}
+
+    def heatmap(self, model_type, N, J_index, observable = 'M'):
+
+        # num_div[0] x num_div[1] map of one observable, NaN where nothing is cached
+        grid = np.full(self.num_div, np.nan)
+        for key, entry in self.entries.items():
+            if key[:3] == (model_type, N, J_index):
+                grid[key[3], key[4]] = entry[observable]
+        return grid
+
+    def notify(self, key):
+        for listener in self.listeners:
+            listener(self, key)
+
+    def save(self):
+
+        # written in least to most recently used order, so loading keeps the LRU order
+        if self.path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok = True)
+            with open(self.path, 'wb') as file:
+                pickle.dump(self.entries, file)
@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+# ----------------------------------------------------------------------------------------------------
+# Instrumentation of the hot paths: wall clock time of each stage of the display loop and of the
+# worker's sweeps, and counters such as the acceptance rate, kept in fixed size rolling windows for
+# the p50/p99 overlay and in a bounded event log that is exported in Chrome's trace format
+# ----------------------------------------------------------------------------------------------------
+# recording is a perf_counter call and a couple of array/list writes, so it is left on all the time,
+# each stage and counter is only ever recorded from one thread (the GUI's or the worker's)
+
+# samples in the rolling window of each stage and counter
+WINDOW = 256
+# events kept for the trace, the oldest are dropped first
+TRACE_EVENTS = 200000
+
+clock = time.perf_counter
+
+class Profiler():
+
+    def __init__(self, window = WINDOW, trace_events = TRACE_EVENTS):
+
+        self.window = window
+        self.trace_events = trace_events
+        self.reset()
+
+    def reset(self):
+
+        # name -> ring buffer of the latest samples and the number recorded so far,
+        # stages hold durations in seconds, counters any other value
+        self.samples = {}
+        self.recorded = {}
+        self.stages = []
+        self.counters = []
+
+        # (phase, name, time, value, thread) events, timed from the origin
+        self.events = []
+        self.origin = clock()
+
+    # ---------
+    # Recording
+    # ---------
+    def record(self, stage, start):
+
+        # time spent in a stage since start, returns the end so consecutive stages can be chained
+        now = clock()
+        if self.add(stage, now - start):
+            self.stages.append(stage)
+        self.log('X', stage, start, now - start)
+        return now
+
+    def count(self, name, value):
+
+        # one value of a counter, e.g. the acceptance rate of a sweep
+        if self.add(name, value):
+            self.counters.append(name)
+        self.log('C', name, clock(), value)
+
+    def add(self, name, value):
+
+        # writes into the name's ring buffer, true the first time the name is seen
+        new = name not in self.samples
+        if new:
+            self.samples[name] = np.zeros(self.window)
+            self.recorded[name] = 0
+        self.samples[name][self.recorded[name] % self.window] = value
+        self.recorded[name] += 1
+        return new
+
+    def log(self, phase, name, time, value):
+        if len(self.events) >= self.trace_events:
+            # a full log drops its oldest half
+            del self.events[:self.trace_events // 2]
+        self.events.append((phase, name, time, value, threading.get_ident()))
+
+    # ----------
+    # Statistics
+    # ----------
+    def percentiles(self, name, q = (50, 99)):
+
+        # percentiles of the rolling window, None before the first sample
+        n = min(self.recorded.get(name, 0), self.window)
+        if n == 0:
+            return None
+        return np.percentile(self.samples[name][:n], q)
+
+    def summary(self):
+
+        # one line per stage (p50/p99 in ms) and per counter (p50/p99 of its values)
+        lines = []
+        for stage in list(self.stages):
+            p50, p99 = self.percentiles(stage)
+            lines.append(f'{stage:<10} {1e3 * p50:7.2f} {1e3 * p99:7.2f} ms')
+        for name in list(self.counters):
+            p50, p99 = self.percentiles(name)
+            lines.append(f'{name:<10} {p50:7.3f} {p99:7.3f}')
+        return '\n'.join([f'{"":<10} {"p50":>7} {"p99":>7}'] + lines)
+
+    # -----
+    # Trace
+    # -----
+    def export(self, path):
+
+        # Chrome trace event JSON (chrome://tracing, ui.perfetto.dev), stages as complete
+        # events on their thread's track and counters as counter tracks, times in microseconds
+        threads = {}
+        trace = []
+        for phase, name, time, value, thread in list(self.events):
+            tid = threads.setdefault(thread, len(threads))
+            event = {'name': name, 'ph': phase, 'ts': 1e6 * (time - self.origin), 'pid': 0, 'tid': tid}
+            if phase == 'X':
+                event['dur'] = 1e6 * value
+            else:
+                event['args'] = {name: value}
+            trace.append(event)
+        for thread, tid in threads.items():
+            name = 'GUI' if thread == threading.main_thread().ident else 'worker'
+            trace.append({'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tid, 'args': {'name': name}})
+
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, file)
+
+        return len(trace)
@@ -0,0 +1,231 @@
+import numpy as np
+import matplotlib
+from numba import njit
+
+# ----------------------------------------------------------------------------------------------------
+# Fast rendering of the lattice: spins are turned straight into screen sized RGBA with a colour lookup
+# table and blitted onto a cached background instead of redrawing the whole figure every frame
+# ----------------------------------------------------------------------------------------------------
+# lattices larger than the screen are block averaged, each pixel showing the mean of every spin under
+# it (one read per visible spin, ~70 ms for all of an 8192^2 lattice on one core, well under its sweep),
+# and the view can be zoomed and panned down to single spins
+# deepest zoom, in screen pixels per spin
+MAX_PIXELS_PER_SPIN = 16
+
+def colour_table(cmap, levels = 256):
+
+    # uint8 RGBA of `levels` evenly spaced colours along the colormap
+    cmap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+    return (cmap(np.linspace(0, 1, levels)) * 255).astype(np.uint8)
+
+@njit(nogil = True, cache = True)
+def paint(lattice, lut, row_start, row_stop, col_start, col_stop, model_type, frame):
+
+    # frame[y,x] is the colour of the block lattice[row_start[y]:row_stop[y], col_start[x]:col_stop[x]],
+    # ising blocks are coloured by their mean spin, xy blocks by their circular mean angle
+    levels = lut.shape[0]
+    # cos/sin of each colour bin, so xy blocks are averaged without trig calls
+    angles = 2 * np.pi * np.arange(levels) / levels
+    cos_table = np.cos(angles)
+    sin_table = np.sin(angles)
+
+    for y in range(frame.shape[0]):
+        r0 = row_start[y]
+        for x in range(frame.shape[1]):
+            c0 = col_start[x]
+
+            if row_stop[y] - r0 == 1 and col_stop[x] - c0 == 1:
+                # one spin under the pixel
+                spin = lattice[r0, c0]
+                if model_type == 0:
+                    k = levels - 1 if spin > 0 else 0
+                else:
+                    k = min(max(int(spin * levels), 0), levels - 1)
+            else:
+                count = (row_stop[y] - r0) * (col_stop[x] - c0)
+                if model_type == 0:
+                    # integer sum of the whole block
+                    total = 0
+                    for I in range(r0, row_stop[y]):
+                        for J in range(c0, col_stop[x]):
+                            total += lattice[I, J]
+                    k = int((total / count + 1) / 2 * (levels - 1) + 0.5)
+                else:
+                    total_x = 0.0
+                    total_y = 0.0
+                    for I in range(r0, row_stop[y]):
+                        for J in range(c0, col_stop[x]):
+                            b = min(max(int(lattice[I, J] * levels), 0), levels - 1)
+                            total_x += cos_table[b]
+                            total_y += sin_table[b]
+                    k = min(int((np.arctan2(total_y, total_x) / (2 * np.pi) % 1.0) * levels), levels - 1)
+
+            for c in range(4):
+                frame[y,x,c] = lut[k,c]
+
+    return frame
+
+# -------------
+# Lattice Image
+# -------------
+class LatticeImage():
+
+    def __init__(self, ax, canvas, cmap, model_type):
+
+        # axes the lattice is drawn into and the agg canvas it belongs to
+        self.ax = ax
+        self.canvas = canvas
+        self.model_type = model_type
+        self.lut = colour_table(cmap)
+
+        # the lattice is not an artist, so full redraws of the figure give the background
+        self.background = None
+        self.lattice = None
+        self.frame = None
+        self.canvas.mpl_connect('draw_event', self.cache_background)
+
+        # zoom over the whole lattice and centre of the view as (row, column) fractions of the lattice,
+        # scrolling zooms about the cursor and dragging pans
+        self.zoom = 1.0
+        self.centre = [0.5, 0.5]
+        self.drag = None
+        self.canvas.mpl_connect('scroll_event', self.scroll)
+        self.canvas.mpl_connect('button_press_event', self.press)
+        self.canvas.mpl_connect('motion_notify_event', self.motion)
+        self.canvas.mpl_connect('button_release_event', self.release)
+
+        # profiler text drawn over the lattice, an animated artist so full draws leave it out of the background,
+        # laying text out takes longer than a frame so its pixels are kept and restored until the text changes
+        self.overlay = None
+        self.overlay_region = None
+
+    def geometry(self, shape):
+
+        # largest square inside the axes, centred like imshow with equal aspect
+        bbox = self.ax.bbox
+        size = max(int(min(bbox.width, bbox.height)), 1)
+        self.x0 = int(bbox.x0 + (bbox.width - size) / 2)
+        self.y0 = int(bbox.y0 + (bbox.height - size) / 2)
+        self.size = size
+
+        # visible window of the lattice, kept inside it
+        self.zoom = min(max(self.zoom, 1.0), max(1.0, MAX_PIXELS_PER_SPIN * min(shape) / size))
+        span = [shape[0] / self.zoom, shape[1] / self.zoom]
+        for a in range(2):
+            self.centre[a] = min(max(self.centre[a], span[a] / 2 / shape[a]), 1 - span[a] / 2 / shape[a])
+        top = self.centre[0] * shape[0] - span[0] / 2
+        left = self.centre[1] * shape[1] - span[1] / 2
+
+        # block of lattice rows/columns under each screen pixel, at least one spin each,
+        # the renderer takes the bottom row of the frame first
+        edges = top + np.arange(size + 1) * span[0] / size
+        row_start = np.minimum(edges[:-1].astype(np.int64), shape[0] - 1)
+        row_stop = np.maximum(np.minimum(edges[1:].astype(np.int64), shape[0]), row_start + 1)
+        self.row_start = row_start[::-1].copy()
+        self.row_stop = row_stop[::-1].copy()
+        edges = left + np.arange(size + 1) * span[1] / size
+        self.col_start = np.minimum(edges[:-1].astype(np.int64), shape[1] - 1)
+        self.col_stop = np.maximum(np.minimum(edges[1:].astype(np.int64), shape[1]), self.col_start + 1)
+        self.frame = np.empty((size, size, 4), dtype = np.uint8)
+
+    def set_colours(self, cmap, model_type):
+
+        # another model drawn into the same axes and canvas, shown from the next reset
+        self.lut = colour_table(cmap)
+        self.model_type = model_type
+
+    def cache_background(self, event = None):
+
+        # retaken after every full draw, which also has to repaint the lattice (and re-render the overlay)
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.overlay_region = None
+        if self.lattice is not None:
+            self.geometry(self.lattice.shape)
+            self.draw(self.lattice)
+
+    def draw(self, lattice):
+
+        # paints the lattice into the frame buffer and onto the agg renderer
+        self.lattice = lattice
+        paint(lattice, self.lut, self.row_start, self.row_stop, self.col_start, self.col_stop, self.model_type, self.frame)
+        renderer = self.canvas.get_renderer()
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, self.x0, self.y0, self.frame)
+        gc.restore()
+        if self.overlay is not None and self.overlay.get_visible():
+            if self.overlay_region is None:
+                self.overlay.draw(renderer)
+                self.overlay_region = self.canvas.copy_from_bbox(self.overlay.get_bbox_patch().get_window_extent(renderer).padded(1))
+            else:
+                self.canvas.restore_region(self.overlay_region)
+
+    def reset(self, lattice):
+
+        # new lattice: back to the full view and one full draw, which repaints the lattice through cache_background
+        self.lattice = lattice
+        self.zoom = 1.0
+        self.centre = [0.5, 0.5]
+        self.canvas.draw()
+
+    def show(self, lattice):
+
+        # restore the background, paint only the lattice and blit it to the canvas
+        self.canvas.restore_region(self.background)
+        self.draw(lattice)
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    # ----------------
+    # Profiler Overlay
+    # ----------------
+    def set_overlay(self, text):
+
+        # text shown in the top left corner from the next frame on, None hides it
+        if self.overlay is None:
+            self.overlay = self.ax.text(0.01, 0.99, '', transform = self.ax.transAxes, ha = 'left', va = 'top',
+                                        family = 'monospace', fontsize = 7, color = 'white', animated = True,
+                                        bbox = dict(facecolor = 'black', linewidth = 0))
+        self.overlay.set_visible(text is not None)
+        if text is not None and text != self.overlay.get_text():
+            self.overlay.set_text(text)
+            self.overlay_region = None
+
+    # --------
+    # Zoom/Pan
+    # --------
+    def view_changed(self):
+
+        # the new window is shown straight away, also while the simulation is paused
+        if self.lattice is not None and self.background is not None:
+            self.geometry(self.lattice.shape)
+            self.show(self.lattice)
+
+    def scroll(self, event):
+
+        # zooms in (scroll up) or out, keeping the spin under the cursor in place
+        if self.lattice is None or event.x is None:
+            return
+        u = (self.y0 + self.size - event.y) / self.size - 0.5
+        v = (event.x - self.x0) / self.size - 0.5
+        old_zoom = self.zoom
+        self.zoom *= 1.25 if event.button == 'up' else 0.8
+        self.geometry(self.lattice.shape)
+        self.centre[0] += u * (1 / old_zoom - 1 / self.zoom)
+        self.centre[1] += v * (1 / old_zoom - 1 / self.zoom)
+        self.view_changed()
+
+    def press(self, event):
+        if event.button == 1 and event.x is not None:
+            self.drag = (event.x, event.y)
+
+    def motion(self, event):
+
+        # the lattice follows the mouse while the button is held
+        if self.drag is None or event.x is None:
+            return
+        self.centre[0] += (event.y - self.drag[1]) / self.size / self.zoom
+        self.centre[1] -= (event.x - self.drag[0]) / self.size / self.zoom
+        self.drag = (event.x, event.y)
+        self.view_changed()
+
+    def release(self, event):
+        self.drag = None
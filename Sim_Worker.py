@@ -0,0 +1,273 @@
+import threading
+import time
+
+import numpy as np
+import numba
+
+import Metro_Algo as metro
+import Backends
+from Profiler import clock
+
+# ---------------------------------
+# Background Simulation Worker
+# ---------------------------------
+# sweeps run on their own thread (the numba kernels release the GIL) while the
+# GUI only ever reads the latest published lattice from a double buffer
+
+# sweeps of the annealing schedule run after a large jump in (T, B)
+ANNEAL_SWEEPS = 32
+# temperature drop and field reversal large enough to be annealed
+ANNEAL_T = 0.5
+ANNEAL_B = 0.2
+# a reversed field is annealed from this temperature, in units of J (just above the ising T_c = 2.269 J)
+HEAT_T = 2.5
+# field holding a quenched lattice to one sign of magnetisation, switched off over the schedule
+BIAS_B = 0.2
+
+def anneal_schedule(old, new, magnetisation, sweeps = ANNEAL_SWEEPS):
+
+    # (B, beta) of each annealing sweep of an ising lattice from the (B, J, beta) old to the new parameters,
+    # last sweep first (so they can be popped), or an empty list when the new point can be swept straight away
+    B_old, J, beta_old = old
+    B_new, J, beta_new = new
+    T_old, T_new = 1 / beta_old, 1 / beta_new
+    T_hot = HEAT_T * J
+
+    if B_old * B_new < 0 and abs(B_new - B_old) >= ANNEAL_B and T_new < T_hot:
+        # a reversed field leaves the lattice in a metastable state it rarely escapes at low T,
+        # so it is heated up and cooled back down geometrically in the new field
+        temperatures = np.geomspace(max(T_old, T_hot), T_new, sweeps)
+        fields = np.full(sweeps, B_new)
+    elif T_old - T_new >= ANNEAL_T and T_new < T_hot:
+        # a quench into the ordered phase freezes in domains (stripes that can take thousands of
+        # sweeps to go), so a field favouring one sign (the new field's, or the current majority's
+        # when there is none) is held on and switched off over the schedule at the new temperature
+        if B_new != 0:
+            sign = np.sign(B_new)
+        else:
+            # a positive field favours down spins
+            sign = -1.0 if magnetisation >= 0 else 1.0
+        temperatures = np.full(sweeps, T_new)
+        fields = B_new + sign * BIAS_B * np.linspace(1, 0, sweeps)
+    else:
+        return []
+
+    return [(B, 1 / T) for B, T in zip(fields[::-1], temperatures[::-1])]
+
+class SimWorker():
+
+    def __init__(self, config, N, model_type, rng_states, sweeps = 0, window = 1.0):
+
+        # lattice being swept, only touched by the worker thread
+        self.config = config
+        self.N = N
+        self.model_type = model_type
+        self.rng_states = rng_states
+
+        # (B, J, beta, cluster, backend) read by the worker before every sweep
+        self.params = (0.0, 1.0, 1.0, False, Backends.DEFAULT)
+        # whether params has been set, the defaults are never annealed from
+        self.params_set = False
+
+        # ---------------
+        # Double Buffer
+        # ---------------
+        # the worker writes into the back buffer only once the GUI has taken the
+        # front one, so the buffer being drawn is never written to
+        self.lock = threading.Lock()
+        self.buffers = [config.copy(), config.copy()]
+        self.front = 0
+        self.fresh = False
+
+        # total sweeps performed, carried over when resuming from a checkpoint
+        self.sweeps = sweeps
+
+        # running [Mx, My, bonds, field] totals kept up to date by the sweeps,
+        # and the streaming averages of the current (T, B, J)
+        self.totals = metro.lattice_totals(config, N, model_type)
+        self.accumulator = metro.Accumulator()
+        self.measured_params = None
+
+        # xy spins also keep a self tuning proposal window, and the backends any
+        # state of their own (trig values, packed lattices, generators) on the worker
+        self.window = window
+        self.trig = None
+
+        # acceptance rate of the last sweep (None for cluster and packed sweeps),
+        # and the profiler its sweeps are timed with, if any
+        self.acceptance = None
+        self.profiler = None
+        # seconds the last sweep took, for the display scheduler
+        self.sweep_time = 0.0
+
+        # (B, J, beta) the sweeps are heading for, and the (B, beta) of the annealing sweeps still to run
+        self.target = None
+        self.schedule = []
+
+        self.thread = None
+        self.stop_event = threading.Event()
+        # the same request to stop, polled inside long running kernels (the n-fold way)
+        self.halt = np.zeros(1, dtype = np.bool_)
+
+    def set_params(self, mag_field, interaction, beta, cluster, backend = Backends.DEFAULT):
+
+        # a single assignment, so the worker never sees half an update
+        self.params = (mag_field, interaction, beta, cluster, backend)
+        self.params_set = True
+
+    def start(self):
+
+        if self.running():
+            return
+
+        # numba's tbb threading layer hangs at exit if its first parallel region runs off the
+        # main thread, so the layer is launched here (once per process, later calls return at once)
+        numba.get_num_threads()
+
+        self.stop_event.clear()
+        self.halt[0] = False
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def stop(self):
+
+        # waits for the sweep in progress to finish (or to halt part way)
+        self.stop_event.set()
+        self.halt[0] = True
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+
+        while not self.stop_event.is_set():
+            self.step()
+
+    def step(self):
+
+        # read in the opposite order to set_params, so params_set is never ahead of params
+        params_set = self.params_set
+        params = self.params
+        mag_field, interaction, beta, cluster, backend = params
+
+        # a large jump in the parameters of an ising lattice is approached through
+        # an annealing schedule, none of whose sweeps are measured
+        if params_set and params[:3] != self.target:
+            if self.target is not None and self.model_type == 0:
+                self.schedule = anneal_schedule(self.target, params[:3], self.totals[0])
+            self.target = params[:3]
+        annealing = len(self.schedule) > 0
+        if annealing:
+            mag_field, beta = self.schedule.pop()
+            self.measured_params = None
+
+        # one sweep with the chosen backend, which keeps self.totals up to date
+        profiler = self.profiler
+        start = clock()
+        self.acceptance = Backends.BACKENDS[backend][0](self, mag_field, interaction, beta, cluster)
+        self.sweeps += 1
+        self.sweep_time = clock() - start
+        if profiler is not None:
+            start = profiler.record('sweep', start)
+            if self.acceptance is not None:
+                profiler.count('acceptance', self.acceptance)
+
+        # averages restart whenever the parameters change
+        if not annealing:
+            if params[:3] != self.measured_params:
+                self.accumulator.reset()
+                self.measured_params = params[:3]
+            self.accumulator.add(*metro.totals_observables(self.totals, mag_field, interaction, self.N))
+            if profiler is not None:
+                start = profiler.record('measure', start)
+
+        # publish only if the GUI has taken the previous frame
+        if not self.fresh:
+            back = 1 - self.front
+            np.copyto(self.buffers[back], self.config)
+            with self.lock:
+                self.front = back
+                self.fresh = True
+            if profiler is not None:
+                profiler.record('publish', start)
+
+    def checkpoint(self, trajectory):
+
+        # appends the state of a stopped worker to a snapshot trajectory
+        mag_field, interaction, beta = self.params[:3]
+        trajectory.append(self.config, 1 / beta, mag_field, interaction, self.sweeps, self.rng_states, self.window)
+
+    def measurements(self):
+
+        # (<|M|>, <E>, susceptibility, specific heat, Binder cumulant) at the current parameters
+        beta = self.params[2]
+        acc = self.accumulator
+        return acc.mean_M, acc.mean_E, acc.susceptibility(beta, self.N), acc.specific_heat(beta, self.N), acc.binder()
+
+    def snapshot(self):
+
+        # latest published lattice, valid until the next call
+        with self.lock:
+            self.fresh = False
+            return self.buffers[self.front]
+
+# ------------
+# Rate Counter
+# ------------
+class RateCounter():
+
+    def __init__(self):
+
+        self.count = 0
+        self.time = time.perf_counter()
+        self.rate = 0.0
+
+    def update(self, count):
+
+        # rate of change of count, averaged over at least half a second
+        now = time.perf_counter()
+        if now - self.time >= 0.5:
+            self.rate = (count - self.count) / (now - self.time)
+            self.count = count
+            self.time = now
+
+        return self.rate
+
+# ---------------
+# Frame Scheduler
+# ---------------
+class FrameScheduler():
+
+    def __init__(self, max_fps = 30, min_fps = 4, display_share = 0.25):
+
+        # the display runs at up to max_fps, but slows down (to no less than min_fps) so that drawing
+        # takes at most display_share of the time and the rest is left to the worker's sweeps
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.display_share = display_share
+
+        # smoothed seconds per displayed frame, and when the next frame is due
+        self.frame_cost = 0.0
+        self.due = None
+
+    def reset(self):
+        self.due = None
+
+    def schedule(self, frame_start, frame_end, shown, sweep_time):
+
+        # milliseconds to wait before the next update
+        if shown:
+            self.frame_cost += 0.2 * (frame_end - frame_start - self.frame_cost)
+
+        # frame period: as short as the frame rate cap and the display share allow, and no shorter
+        # than a sweep, since redrawing an unchanged lattice only takes time away from the sweeps
+        period = max(1 / self.max_fps, self.frame_cost / self.display_share, sweep_time)
+        period = min(period, 1 / self.min_fps)
+
+        # frames are due a period apart rather than a period after the last one finished,
+        # so late after() callbacks do not add up, but a stalled display does not try to catch up
+        self.due = frame_end + period if self.due is None else max(frame_end, self.due + period)
+        return max(1, int(1000 * (self.due - frame_end)))
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+
+# ----------------------------------------------------------------------------------------------------
+# Snapshot trajectories: frames of one lattice size and model appended to a binary file, each frame
+# holding the lattice with everything needed to resume the run from it, read back lazily via a memmap
+# ----------------------------------------------------------------------------------------------------
+# only the per-row rng_states streams are kept, so a resumed run repeats the original sweep for sweep
+# with the checkerboard (ising and xy) and n-fold way kernels, while wolff clusters (numba's global
+# generator), the numpy backend's generator and the packed multispin streams carry on from fresh states
+
+MAGIC = b'SPINTRJ1'
+# magic, N, model_type padded to a fixed size
+HEADER = np.dtype([('magic', 'S8'), ('N', '<i8'), ('model_type', '<i8'), ('pad', 'V40')])
+
+def frame_dtype(N, model_type):
+
+    # ising spins are bit packed (1 bit per spin), xy angles are kept exactly as float64
+    if model_type == 0:
+        spins = ('spins', 'u1', (N * N + 7) // 8)
+    else:
+        spins = ('spins', '<f8', (N, N))
+
+    return np.dtype([('T', '<f8'), ('B', '<f8'), ('J', '<f8'),
+                     ('sweep', '<i8'),
+                     ('window', '<f8'),
+                     ('rng_states', '<u8', (N,)),
+                     spins])
+
+# ----------
+# Trajectory
+# ----------
+class Trajectory():
+
+    def __init__(self, path, N = None, model_type = None):
+
+        self.path = path
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.itemsize:
+            # existing file, N and model type come from its header
+            header = np.fromfile(path, dtype = HEADER, count = 1)[0]
+            if header['magic'] != MAGIC:
+                raise ValueError(f'{path} is not a snapshot trajectory')
+            if (N is not None and N != header['N']) or (model_type is not None and model_type != header['model_type']):
+                raise ValueError(f'{path} holds N = {header["N"]}, model_type = {header["model_type"]} frames')
+            self.N = int(header['N'])
+            self.model_type = int(header['model_type'])
+        else:
+            if N is None or model_type is None:
+                raise ValueError('N and model_type are needed to create a new trajectory')
+            self.N = N
+            self.model_type = model_type
+            header = np.zeros(1, dtype = HEADER)
+            header['magic'] = MAGIC
+            header['N'] = N
+            header['model_type'] = model_type
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+            header.tofile(path)
+
+        self.dtype = frame_dtype(self.N, self.model_type)
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - HEADER.itemsize) // self.dtype.itemsize
+
+    def append(self, config, T, B, J, sweep, rng_states, window = 1.0):
+
+        # writes one frame from a ghost cell configuration to the end of the file
+        N = self.N
+        frame = np.zeros(1, dtype = self.dtype)
+        frame['T'] = T
+        frame['B'] = B
+        frame['J'] = J
+        frame['sweep'] = sweep
+        frame['window'] = window
+        frame['rng_states'] = rng_states
+        if self.model_type == 0:
+            frame['spins'] = np.packbits(config[1:N+1,1:N+1] > 0)
+        else:
+            frame['spins'] = config[1:N+1,1:N+1]
+
+        with open(self.path, 'ab') as file:
+            file.write(frame.tobytes())
+
+    def frames(self):
+
+        # memory mapped view of every frame, only the frames that are read are loaded
+        return np.memmap(self.path, dtype = self.dtype, mode = 'r', offset = HEADER.itemsize, shape = (len(self),))
+
+    def __getitem__(self, i):
+        return self.frames()[i]
+
+    def lattice(self, i):
+
+        # ghost cell configuration of frame i, as built by ini_config
+        N = self.N
+        spins = self.frames()[i]['spins']
+        if self.model_type == 0:
+            interior = (2 * np.unpackbits(spins, count = N * N).astype(np.int8) - 1).reshape(N, N)
+        else:
+            interior = np.array(spins)
+
+        return np.pad(interior, 1, mode = 'wrap')
+
+    def __iter__(self):
+
+        # replays the trajectory one lattice at a time
+        for i in range(len(self)):
+            yield self.lattice(i)
+
+    def resume(self, i = -1):
+
+        # everything needed to carry on from frame i (the last by default)
+        frame = self.frames()[i]
+        return {'config': self.lattice(i),
+                'T': float(frame['T']), 'B': float(frame['B']), 'J': float(frame['J']),
+                'sweep': int(frame['sweep']),
+                'window': float(frame['window']),
+                'rng_states': np.array(frame['rng_states'])}
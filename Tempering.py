@@ -0,0 +1,157 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+import Metro_Algo as metro
+import Analysis as analysis
+
+# ----------------------------------------------------------------------------------------------------
+# Parallel tempering: replicas at a ladder of temperatures sweep in parallel (one replica per thread)
+# and neighbouring temperatures are swapped with the Metropolis rule, so low temperature replicas
+# escape domain walls and vortex pairs by wandering up the ladder and back
+# ----------------------------------------------------------------------------------------------------
+# only temperature labels are exchanged, the lattices never move in memory
+
+# T axis of the phase diagram (0 to 3.5), T = 0 itself is never sampled
+T_RANGE = (0.1, 3.5)
+
+def ladder(R, T_min = T_RANGE[0], T_max = T_RANGE[1]):
+
+    # R temperatures in geometric progression, denser at low T where the energy fluctuations are small
+    return np.geomspace(T_min, T_max, R)
+
+# ---------
+# Tempering
+# ---------
+class Tempering():
+
+    def __init__(self, N, model_type, temperatures, mag_field = 0.0, interaction = 1.0, seed = None):
+
+        self.N = N
+        self.model_type = model_type
+        self.mag_field = mag_field
+        self.interaction = interaction
+        R = len(temperatures)
+
+        # ladder slot k holds temperature T[k], replica[k] is the lattice currently at slot k
+        self.T = np.sort(np.asarray(temperatures, dtype = float))
+        self.betas = 1 / self.T
+        self.replica = np.arange(R)
+
+        self.configs = metro.ini_batch(R, N, model_type)
+        self.mag_fields = np.full(R, float(mag_field))
+        # one random number stream per replica for the sweeps, and one for the swaps
+        self.rng_states = metro.ini_rng(R, seed)
+        self.rng = np.random.default_rng(seed)
+
+        # swaps proposed and accepted between slots k and k+1
+        self.attempted = np.zeros(R - 1, dtype = np.int64)
+        self.accepted = np.zeros(R - 1, dtype = np.int64)
+        self.sweeps = 0
+        self.swaps = 0
+
+    def sweep(self, sweeps = 1):
+
+        # every replica sweeps at the temperature of the slot it is in
+        betas = np.empty(len(self.T))
+        betas[self.replica] = self.betas
+        for i in range(sweeps):
+            metro.batch_sweep(self.configs, self.mag_fields, self.interaction, betas, self.N, self.model_type, self.rng_states)
+        self.sweeps += sweeps
+
+    def swap(self):
+
+        # -----------------
+        # Replica Exchange
+        # -----------------
+        # neighbouring slots (k, k+1), even pairs and odd pairs in turn, swap their
+        # replicas with probability min(1, exp((beta_k - beta_k+1) (E_k - E_k+1)))
+        magnetisation, energy = metro.batch_observables(self.configs, self.mag_fields, self.interaction, self.N, self.model_type)
+        energy = energy[self.replica] * self.N * self.N
+
+        for k in range(self.swaps % 2, len(self.T) - 1, 2):
+            self.attempted[k] += 1
+            delta = (self.betas[k] - self.betas[k+1]) * (energy[k] - energy[k+1])
+            if delta >= 0 or np.exp(delta) >= self.rng.random():
+                self.accepted[k] += 1
+                self.replica[k], self.replica[k+1] = self.replica[k+1], self.replica[k]
+                energy[k], energy[k+1] = energy[k+1], energy[k]
+        self.swaps += 1
+
+    def run(self, sweeps, swap_every = 10):
+
+        # sweeps with a round of swaps after every `swap_every` of them, a round costs about
+        # one tenth of a sweep (the energies are recounted), so every 10 sweeps keeps it under 1%
+        for i in range(sweeps // swap_every):
+            self.sweep(swap_every)
+            self.swap()
+
+    def acceptance(self):
+
+        # swap acceptance rate of each neighbouring pair of temperatures
+        return self.accepted / np.maximum(self.attempted, 1)
+
+    def lattice(self, k):
+
+        # configuration currently at temperature T[k]
+        return self.configs[self.replica[k]]
+
+    def observables(self):
+
+        # per site |M| and E at each temperature of the ladder
+        magnetisation, energy = metro.batch_observables(self.configs, self.mag_fields, self.interaction, self.N, self.model_type)
+        return magnetisation[self.replica], energy[self.replica]
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'Parallel tempering of the Ising or XY model over a temperature ladder.')
+    parser.add_argument('--N', type = int, default = 32, help = 'lattice size')
+    parser.add_argument('--model', type = int, choices = (0, 1), default = 0, help = '0 = Ising, 1 = XY')
+    parser.add_argument('--R', type = int, default = 16, help = 'number of replicas (temperatures)')
+    parser.add_argument('--T-min', type = float, default = T_RANGE[0], help = 'lowest temperature')
+    parser.add_argument('--T-max', type = float, default = T_RANGE[1], help = 'highest temperature')
+    parser.add_argument('--B', type = float, default = 0.0, help = 'magnetic field')
+    parser.add_argument('--J', type = float, default = 1.0, help = 'interaction strength')
+    parser.add_argument('--burn-in', type = int, default = 1000, help = 'sweeps before measuring')
+    parser.add_argument('--sweeps', type = int, default = 1000, help = 'measured sweeps')
+    parser.add_argument('--swap-every', type = int, default = 10, help = 'sweeps between rounds of swaps')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed for a reproducible run')
+    parser.add_argument('--output', default = 'tempering.csv', help = 'CSV file the results are written to')
+    args = parser.parse_args(argv)
+    # every measurement is taken after a whole round of swaps
+    if args.swap_every < 1:
+        parser.error('--swap-every must be at least 1')
+    if args.sweeps < args.swap_every:
+        parser.error('--sweeps must be at least --swap-every, or no round of swaps is measured')
+
+    start = time.perf_counter()
+    # ini_config draws from numpy's global generator
+    np.random.seed(args.seed)
+    tempering = Tempering(args.N, args.model, ladder(args.R, args.T_min, args.T_max), args.B, args.J, args.seed)
+    tempering.run(args.burn_in, args.swap_every)
+
+    # per site |M| and E at each temperature after every round of swaps
+    m = np.empty((args.sweeps // args.swap_every, args.R))
+    e = np.empty((args.sweeps // args.swap_every, args.R))
+    for i in range(len(m)):
+        tempering.run(args.swap_every, args.swap_every)
+        m[i], e[i] = tempering.observables()
+
+    acceptance = np.append(tempering.acceptance(), np.nan)
+    with open(args.output, 'w', newline = '') as file:
+        writer = csv.writer(file)
+        writer.writerow(['T', 'magnetisation', 'magnetisation_error', 'energy', 'energy_error', 'swap_acceptance'])
+        for k, T in enumerate(tempering.T):
+            magnetisation = analysis.jackknife(np.mean, m[:,k])
+            energy = analysis.jackknife(np.mean, e[:,k])
+            writer.writerow([T, *magnetisation, *energy, acceptance[k]])
+            print(f'T = {T:.3f}: M = {magnetisation[0]:.4f} ± {magnetisation[1]:.4f}, E = {energy[0]:.4f} ± {energy[1]:.4f}, '
+                  f'swap acceptance to next T = {acceptance[k]:.2f}')
+
+    print(f'{tempering.sweeps} sweeps of {args.R} replicas in {time.perf_counter() - start:.1f} s, results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import threading
+
+import numba
+from numba import types
+
+import Metro_Algo as metro
+import XY_Algo as xy
+import Render
+import NFold_Algo as nfold
+
+# ----------------------------------------------------------------------------------------------------
+# Kernel warm up: compiles the kernels the GUI calls for exactly the argument types it passes them, on
+# a background thread at launch (loaded from numba's on-disk cache after the first run), then freezes
+# them so a stray int where a float is expected is cast instead of triggering a recompile
+# ----------------------------------------------------------------------------------------------------
+
+ising = types.int8[:, ::1]
+xy_spins = types.float64[:, ::1]
+trig = types.float64[:, :, ::1]
+rng_states = types.uint64[::1]
+totals = types.float64[::1]
+real = types.float64
+integer = types.int64
+
+# kernel -> signatures, in the order the GUI first needs them
+SIGNATURES = [
+    # initial configuration, running totals and first frame
+    (metro.ghost_cells, [(ising, integer), (xy_spins, integer)]),
+    (metro.lattice_totals, [(ising, integer, integer), (xy_spins, integer, integer)]),
+    (metro.totals_observables, [(totals, real, real, integer)]),
+    (Render.paint, [(types.int8[:, :], types.uint8[:, ::1]) + (types.int64[::1],) * 4 + (integer, types.uint8[:, :, ::1]),
+                    (types.float64[:, :], types.uint8[:, ::1]) + (types.int64[::1],) * 4 + (integer, types.uint8[:, :, ::1])]),
+    # sweeps of the simulation worker
+    (metro.checkerboard_sweep, [(ising, real, real, real, integer, integer, rng_states, totals)]),
+    (metro.sweep, [(ising, real, real, real, integer, integer, types.boolean, types.float64[::1])]),
+    (xy.metropolis_sweep, [(xy_spins, trig, real, real, real, integer, rng_states, totals, real)]),
+    (xy.overrelax_sweep, [(xy_spins, trig, real, real, real, integer, rng_states, totals)]),
+    # rejection free ising sweeps, picked from the backend menu
+    (nfold.ini_classes, [(ising, integer)]),
+    (nfold.mean_rate, [(types.int64[::1], real, real, real, integer)]),
+    (nfold.run, [(ising, types.int32[::1], types.int32[::1], types.int64[::1], types.int8[::1], real, real, real, integer, rng_states, totals, real, types.boolean[::1])]),
+]
+
+def warm_up():
+
+    # compile (or load from the cache) every signature, then stop compiling new ones
+    for kernel, signatures in SIGNATURES:
+        for signature in signatures:
+            kernel.compile(signature)
+        kernel.disable_compile()
+
+def start():
+
+    # compiling a parallel kernel starts numba's threading layer, and the tbb layer
+    # hangs at exit unless it was started on the main thread, so it is started here
+    numba.get_num_threads()
+    thread = threading.Thread(target = warm_up, daemon = True)
+    thread.start()
+
+    return thread
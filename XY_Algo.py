@@ -0,0 +1,143 @@
+import numpy as np
+from numba import njit, prange
+
+import Metro_Algo as metro
+
+# --------------------------------------------------------
+# XY Model with precomputed trig and over-relaxation moves
+# --------------------------------------------------------
+# spins are stored as in Metro_Algo (angle / 2pi in [0,1) with ghost cells) and
+# trig[0], trig[1], trig[2] hold cos(2pi s), sin(2pi s) and cos(s) of every site,
+# so a bond energy is a dot product and a proposal needs three trig calls
+
+# acceptance rate the proposal window is tuned towards
+TARGET_ACCEPTANCE = 0.5
+
+def ini_trig(config, N):
+
+    # trig arrays of a configuration, ghost cells included
+    return np.stack([np.cos(2 * np.pi * config), np.sin(2 * np.pi * config), np.cos(config)])
+
+def tune_window(window, acceptance):
+
+    # widen the window when too many proposals are accepted, shrink it when too few,
+    # a window of 1 proposes uniformly over the circle
+    window *= min(max(acceptance / TARGET_ACCEPTANCE, 0.5), 2.0)
+    return min(max(window, 1e-3), 1.0)
+
+@njit(parallel = True, nogil = True, cache = True)
+def metropolis_sweep(config, trig, mag_field, interaction, beta, N, rng_states, totals, window):
+
+    # the red/black colouring only wraps consistently for even N
+    if N % 2 != 0:
+        raise ValueError('checkerboard sweep needs an even lattice size N')
+
+    # ----------------------------
+    # Windowed Checkerboard Sweep
+    # ----------------------------
+    # each spin is moved by a uniform step in (-window/2, window/2)
+    accepted = 0
+    for colour in range(2):
+        d_mag_x = 0.0
+        d_mag_y = 0.0
+        d_bonds = 0.0
+        d_field = 0.0
+
+        for I in prange(1, N+1):
+            for J in range(1 + (I + 1 + colour) % 2, N+1, 2):
+                # local field of the neighbours
+                h_x = trig[0,I+1,J] + trig[0,I-1,J] + trig[0,I,J+1] + trig[0,I,J-1]
+                h_y = trig[1,I+1,J] + trig[1,I-1,J] + trig[1,I,J+1] + trig[1,I,J-1]
+
+                new_spin = (config[I,J] + window * (metro.rand_uniform(rng_states, I-1) - 0.5)) % 1.0
+                new_cos = np.cos(2 * np.pi * new_spin)
+                new_sin = np.sin(2 * np.pi * new_spin)
+                new_field = np.cos(new_spin)
+
+                delta_bonds = (new_cos - trig[0,I,J]) * h_x + (new_sin - trig[1,I,J]) * h_y
+                delta_field = new_field - trig[2,I,J]
+                delta_energy = mag_field * delta_field - interaction * delta_bonds
+
+                # accept if energy efficient or with the boltzmann probability
+                if delta_energy <= 0 or np.exp(-beta * delta_energy) >= metro.rand_uniform(rng_states, I-1):
+                    d_mag_x += new_cos - trig[0,I,J]
+                    d_mag_y += new_sin - trig[1,I,J]
+                    d_bonds += delta_bonds
+                    d_field += delta_field
+                    config[I,J] = new_spin
+                    trig[0,I,J] = new_cos
+                    trig[1,I,J] = new_sin
+                    trig[2,I,J] = new_field
+                    accepted += 1
+
+        totals[0] += d_mag_x
+        totals[1] += d_mag_y
+        totals[2] += d_bonds
+        totals[3] += d_field
+
+        # ghost cells only change between the two half sweeps
+        metro.ghost_cells(config, N)
+        for c in range(3):
+            metro.ghost_cells(trig[c], N)
+
+    return accepted / (N*N)
+
+@njit(parallel = True, nogil = True, cache = True)
+def overrelax_sweep(config, trig, mag_field, interaction, beta, N, rng_states, totals):
+
+    if N % 2 != 0:
+        raise ValueError('checkerboard sweep needs an even lattice size N')
+
+    # ----------------------
+    # Over-Relaxation Sweep
+    # ----------------------
+    # each spin is reflected about its local field, which leaves the bond energy
+    # unchanged, the move is its own inverse so only the field term needs a
+    # metropolis test (always accepted at B = 0)
+    for colour in range(2):
+        d_mag_x = 0.0
+        d_mag_y = 0.0
+        d_field = 0.0
+
+        for I in prange(1, N+1):
+            for J in range(1 + (I + 1 + colour) % 2, N+1, 2):
+                h_x = trig[0,I+1,J] + trig[0,I-1,J] + trig[0,I,J+1] + trig[0,I,J-1]
+                h_y = trig[1,I+1,J] + trig[1,I-1,J] + trig[1,I,J+1] + trig[1,I,J-1]
+                if h_x == 0 and h_y == 0:
+                    continue
+
+                field_angle = np.arctan2(h_y, h_x) / (2 * np.pi)
+                new_spin = (2 * field_angle - config[I,J]) % 1.0
+                new_field = np.cos(new_spin)
+                delta_field = new_field - trig[2,I,J]
+
+                if mag_field * delta_field <= 0 or np.exp(-beta * mag_field * delta_field) >= metro.rand_uniform(rng_states, I-1):
+                    new_cos = np.cos(2 * np.pi * new_spin)
+                    new_sin = np.sin(2 * np.pi * new_spin)
+                    d_mag_x += new_cos - trig[0,I,J]
+                    d_mag_y += new_sin - trig[1,I,J]
+                    d_field += delta_field
+                    config[I,J] = new_spin
+                    trig[0,I,J] = new_cos
+                    trig[1,I,J] = new_sin
+                    trig[2,I,J] = new_field
+
+        totals[0] += d_mag_x
+        totals[1] += d_mag_y
+        totals[3] += d_field
+
+        metro.ghost_cells(config, N)
+        for c in range(3):
+            metro.ghost_cells(trig[c], N)
+
+    return config
+
+def sweep(config, trig, mag_field, interaction, beta, N, rng_states, totals, window, overrelax = 1):
+
+    # one metropolis sweep followed by `overrelax` over-relaxation sweeps,
+    # returns the metropolis acceptance rate
+    acceptance = metropolis_sweep(config, trig, mag_field, interaction, beta, N, rng_states, totals, window)
+    for i in range(overrelax):
+        overrelax_sweep(config, trig, mag_field, interaction, beta, N, rng_states, totals)
+
+    return acceptance